@@ -0,0 +1,140 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bench.scenarios import SCENARIOS, run_scenario
+
+
+# Higher is better for these, lower is better for the rest
+HIGHER_IS_BETTER = ("blocks_per_sec", "transactions_per_sec")
+COMPARED = ("blocks_per_sec", "transactions_per_sec", "peak_rss_mb")
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns the regressions of results against a baseline.
+
+    A metric regresses when it is more than threshold (a fraction) worse than the baseline.
+
+    Args:
+        results (dict): The scenario results of this run.
+        baseline (dict): The scenario results of the baseline run.
+        threshold (float): The allowed slowdown or growth, e.g. 0.1 for 10%.
+
+    Returns:
+        list: (scenario, metric, baseline value, value) for every regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        for metric in COMPARED:
+            old = baseline[name].get(metric)
+            new = result.get(metric)
+            if not old or new is None:
+                continue
+
+            if metric in HIGHER_IS_BETTER:
+                worse = new < old * (1 - threshold)
+            else:
+                worse = new > old * (1 + threshold)
+
+            if worse:
+                regressions.append((name, metric, old, new))
+
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="python -m bench",
+        description="Run the benchmark scenarios and compare them to a baseline.",
+    )
+
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument(
+        "--blocks",
+        type=int,
+        default=None,
+        help="Overrides the block count of the scenarios that stop at one.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Results file. Defaults to bench/results/<time>.json.",
+    )
+    parser.add_argument(
+        "--baseline", type=str, default=None, help="Results file to compare against."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Fraction a metric may be worse than the baseline before it fails.",
+    )
+
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.scenarios:
+        # A fresh process per scenario so each peak RSS is its own
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            result = executor.submit(run_scenario, name, args.blocks, args.seed).result()
+
+        results[name] = result
+        print(
+            f"{name}: {round(result['blocks_per_sec'], 2)} blocks/s "
+            f"{round(result['transactions_per_sec'], 2)} tx/s "
+            f"{round(result['peak_rss_mb'], 1)} MB "
+            f"{result['events']} events "
+            f"{round(result['wall_time'], 2)}s"
+        )
+
+    output = args.output
+    if output is None:
+        os.makedirs(os.path.join("bench", "results"), exist_ok=True)
+        output = os.path.join(
+            "bench", "results", time.strftime("%Y%m%d-%H%M%S") + ".json"
+        )
+
+    with open(output, "w") as file:
+        json.dump(
+            {
+                "meta": {
+                    "time": time.time(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "blocks": args.blocks,
+                    "seed": args.seed,
+                },
+                "results": results,
+            },
+            file,
+            indent=2,
+        )
+    print(f"Saved results to {output}")
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+
+        regressions = compare(results, baseline, args.threshold)
+        for name, metric, old, new in regressions:
+            print(f"Regression: {name} {metric} {round(old, 2)} -> {round(new, 2)}")
+
+        if regressions:
+            sys.exit(1)
+
+        print(f"No regressions beyond {round(args.threshold * 100)}%")
@@ -0,0 +1,127 @@
+import contextlib
+import io
+import resource
+import sys
+import time
+
+import simpy
+
+from main import main
+
+
+# The README command, cut short at a number of blocks
+README = {
+    "num_miners": 5,
+    "num_nodes": 2,
+    "num_neighbors": 1,
+    "hashrate": 10000,
+    "blocktime": 3.27,
+    "blocksize": 32000,
+    "num_wallets": 10,
+    "num_transactions": 0,
+    "interval": 10.0,
+    "print_interval": 1000000,
+    "reward": 51.8457072,
+    "halving": 964400,
+    "years": 10,
+    "latency": 0.1,
+    "bandwidth": 1024,
+    "fee": 0.01,
+}
+
+# Scenarios with blocks set stop at that block count, the others run until their workload is done
+SCENARIOS = {
+    "readme": {**README, "blocks": 20000},
+    "wallets": {
+        **README,
+        "num_wallets": 1000,
+        "num_transactions": 1000,
+        "blocktime": 10,
+        "blocksize": 4000,
+        "latency": 0,
+        "bandwidth": float("inf"),
+        "fee": 0,
+    },
+    "network": {
+        **README,
+        "num_nodes": 500,
+        "num_neighbors": 8,
+        "blocktime": 100,
+        "blocks": 500,
+        "latency": 0.1,
+        "bandwidth": 1024 * 1024,
+        "fee": 0,
+    },
+    "fees": {
+        **README,
+        "num_wallets": 100,
+        "num_transactions": 100,
+        "blocktime": 10,
+        "blocksize": 200,
+        "latency": 0,
+        "bandwidth": float("inf"),
+        "fee": 0.05,
+        "fee_priority": True,
+    },
+}
+
+
+def get_peak_rss():
+    """
+    Returns the peak resident set size of this process in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reports kilobytes, macOS bytes
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def run_scenario(name, blocks, seed):
+    """
+    Runs one scenario and measures it. Meant to run in a fresh process so the peak RSS is its own.
+
+    SimPy events are counted by wrapping Environment.step for the length of the run.
+
+    Args:
+        name (str): The scenario.
+        blocks (int): Overrides the block count of the scenarios that stop at one. None keeps the scenario's own.
+        seed (int): The seed.
+
+    Returns:
+        dict: The results of the run.
+    """
+    config = dict(SCENARIOS[name])
+    if blocks is not None and "blocks" in config:
+        config["blocks"] = blocks
+
+    events = 0
+    step = simpy.Environment.step
+
+    def counting_step(env):
+        nonlocal events
+        events += 1
+        return step(env)
+
+    simpy.Environment.step = counting_step
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = main(**config, seed=seed)
+        elapsed = time.perf_counter() - start
+    finally:
+        simpy.Environment.step = step
+
+    total_blocks = stats.blockchain.total_blocks
+    total_transactions = stats.blockchain.total_transactions
+
+    return {
+        "wall_time": elapsed,
+        "blocks": total_blocks,
+        "transactions": total_transactions,
+        "blocks_per_sec": total_blocks / elapsed,
+        "transactions_per_sec": total_transactions / elapsed,
+        "peak_rss_mb": get_peak_rss(),
+        "events": events,
+    }
@@ -0,0 +1,218 @@
+class BlockTree:
+    """
+    The tree of competing blocks a node knows about, indexed by parent id.
+
+    Each block is stored as its parent, height and cumulative work, so a block takes a few dict entries however
+    many transactions it holds. The tip is the block with the most cumulative work, ties going to the one seen
+    first. A new tip that does not extend the old one is a reorg, whose depth is the number of blocks of the old
+    chain it replaced.
+
+    Blocks that arrive before their parent are held as orphans until the parent arrives. Blocks more than finality
+    blocks below the tip are pruned: the main chain's are final, and every block off it below that depth (and all
+    of its descendants) is stale.
+
+    Attributes:
+        finality: The depth below the tip beyond which blocks are pruned.
+        genesis: The id of the block every chain starts from. It is not counted as a mined block.
+        parents: The parent of each block, keyed by block id.
+        heights: The height of each block, keyed by block id.
+        work: The cumulative work of each block, keyed by block id.
+        children: The children of each block, keyed by block id.
+        by_height: The blocks at each height, keyed by height.
+        orphans: Blocks waiting for their parent as (block id, work) lists, keyed by the parent id.
+        root: The oldest block kept. Every block is its descendant.
+        tip: The best block.
+        added: The number of blocks added.
+        orphaned: The number of blocks that arrived before their parent.
+        final: The number of main chain blocks pruned.
+        stale: The number of blocks pruned off the main chain.
+        reorgs: The number of reorgs.
+        reorg_depth: The total depth of all reorgs.
+        max_reorg_depth: The deepest reorg.
+    """
+
+    def __init__(self, finality=100, genesis=-1):
+        if finality < 1:
+            raise ValueError("Finality depth must be at least 1")
+
+        self.finality = finality
+        self.genesis = genesis
+        self.parents = {genesis: None}
+        self.heights = {genesis: 0}
+        self.work = {genesis: 0}
+        self.children = {}
+        self.by_height = {0: {genesis}}
+        self.orphans = {}
+        self.root = genesis
+        self.tip = genesis
+        self.added = 0
+        self.orphaned = 0
+        self.final = 0
+        self.stale = 0
+        self.reorgs = 0
+        self.reorg_depth = 0
+        self.max_reorg_depth = 0
+
+    def add(self, block_id, parent_id, work):
+        """
+        Adds a block, and any orphans waiting on it, and moves the tip if it has more work.
+
+        A block whose parent has already been pruned is stale on arrival and dropped.
+
+        Args:
+            block_id (int): The id of the block.
+            parent_id (int): The id of the block it extends.
+            work (float): The work of the block, its difficulty.
+
+        Returns:
+            bool: Whether the block was added to the tree now, rather than held as an orphan or dropped.
+        """
+        if block_id in self.parents:
+            return False
+
+        if parent_id not in self.parents:
+            # Ids are given in mining order, so a missing parent mined before the root was pruned
+            if parent_id < self.root:
+                self.stale += 1
+                return False
+
+            self.orphaned += 1
+            self.orphans.setdefault(parent_id, []).append((block_id, work))
+            return False
+
+        pending = [(block_id, parent_id, work)]
+        while pending:
+            block_id, parent_id, work = pending.pop()
+            self.insert(block_id, parent_id, work)
+
+            for child_id, child_work in self.orphans.pop(block_id, ()):
+                pending.append((child_id, block_id, child_work))
+
+        self.prune()
+        return True
+
+    def insert(self, block_id, parent_id, work):
+        height = self.heights[parent_id] + 1
+
+        self.parents[block_id] = parent_id
+        self.heights[block_id] = height
+        self.work[block_id] = self.work[parent_id] + work
+        self.children.setdefault(parent_id, []).append(block_id)
+        self.by_height.setdefault(height, set()).add(block_id)
+        self.added += 1
+
+        if self.work[block_id] <= self.work[self.tip]:
+            return
+
+        if parent_id != self.tip:
+            depth = self.heights[self.tip] - self.heights[
+                self.get_common_ancestor(self.tip, block_id)
+            ]
+            if depth > 0:
+                self.reorgs += 1
+                self.reorg_depth += depth
+                self.max_reorg_depth = max(self.max_reorg_depth, depth)
+
+        self.tip = block_id
+
+    def get_common_ancestor(self, a, b):
+        """
+        Returns the highest block both a and b descend from.
+        """
+        while self.heights[a] > self.heights[b]:
+            a = self.parents[a]
+        while self.heights[b] > self.heights[a]:
+            b = self.parents[b]
+        while a != b:
+            a = self.parents[a]
+            b = self.parents[b]
+        return a
+
+    def get_main_chain(self):
+        """
+        Returns the ids of the blocks from the tip down to the root.
+        """
+        chain = []
+        block_id = self.tip
+        while block_id is not None:
+            chain.append(block_id)
+            block_id = self.parents[block_id]
+        return chain
+
+    def get_stale_count(self):
+        """
+        Returns the number of stale blocks, counting the kept blocks that are off the main chain.
+        """
+        return self.stale + len(self.parents) - len(self.get_main_chain())
+
+    def prune(self):
+        """
+        Moves the root up to finality blocks below the tip and drops every block below it.
+        """
+        height = self.heights[self.tip] - self.finality
+        if height <= self.heights[self.root]:
+            return
+
+        root = self.tip
+        while self.heights[root] > height:
+            root = self.parents[root]
+
+        # The main chain from the new root down to the old one
+        main = set()
+        block_id = root
+        while block_id != self.root:
+            main.add(block_id)
+            block_id = self.parents[block_id]
+        main.add(self.root)
+
+        for h in range(self.heights[self.root], height + 1):
+            for block_id in list(self.by_height.get(h, ())):
+                if block_id == root:
+                    continue
+
+                if block_id in main:
+                    self.remove(block_id)
+                    if block_id != self.genesis:
+                        self.final += 1
+                else:
+                    self.stale += self.remove_subtree(block_id)
+
+            if h < height:
+                self.by_height.pop(h, None)
+
+        self.parents[root] = None
+        self.root = root
+
+        # Orphans of pruned blocks will never connect
+        for parent_id in [p for p in self.orphans if p < root]:
+            self.stale += len(self.orphans.pop(parent_id))
+
+    def remove(self, block_id):
+        del self.parents[block_id]
+        del self.work[block_id]
+        self.children.pop(block_id, None)
+        self.by_height[self.heights.pop(block_id)].discard(block_id)
+
+    def remove_subtree(self, block_id):
+        """
+        Removes a block and all of its descendants.
+
+        Returns:
+            int: The number of blocks removed.
+        """
+        count = 0
+        pending = [block_id]
+        while pending:
+            block_id = pending.pop()
+            pending.extend(self.children.get(block_id, ()))
+
+            height = self.heights[block_id]
+            self.remove(block_id)
+            if not self.by_height[height]:
+                del self.by_height[height]
+            count += 1
+
+        return count
+
+    def __len__(self):
+        return len(self.parents)
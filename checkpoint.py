@@ -0,0 +1,386 @@
+import gzip
+import os
+import pickle
+from collections import deque
+
+from core import Block, Transaction
+
+
+# Bumped whenever the layout of the saved state changes
+CHECKPOINT_VERSION = 3
+
+
+def get_ring_state(buffer):
+    return {
+        "capacity": buffer.capacity,
+        "values": buffer.values.copy(),
+        "count": buffer.count,
+        "total": buffer.total,
+        "sums": dict(buffer.sums),
+        "since_refresh": buffer.since_refresh,
+    }
+
+
+def set_ring_state(buffer, state):
+    buffer.capacity = state["capacity"]
+    buffer.values = state["values"]
+    buffer.count = state["count"]
+    buffer.total = state["total"]
+    buffer.sums = state["sums"]
+    buffer.since_refresh = state["since_refresh"]
+
+
+def get_histogram_state(histogram):
+    return {
+        "counts": histogram.counts.copy(),
+        "count": histogram.count,
+        "total": histogram.total,
+        "min": histogram.min,
+        "max": histogram.max,
+    }
+
+
+def set_histogram_state(histogram, state):
+    histogram.counts = state["counts"]
+    histogram.count = state["count"]
+    histogram.total = state["total"]
+    histogram.min = state["min"]
+    histogram.max = state["max"]
+
+
+def get_variates_state(variates):
+    """
+    Returns the state of a BufferedVariates without its buffers, which are drawn again from the generator state
+    of their last refill on restore.
+    """
+    return {
+        "generator": variates.generator.bit_generator.state,
+        "uniform_state": variates.uniform_state,
+        "uniform_size": len(variates.uniforms),
+        "uniform_index": variates.uniform_index,
+        "exponential_state": variates.exponential_state,
+        "exponential_size": len(variates.exponentials),
+        "exponential_index": variates.exponential_index,
+    }
+
+
+def set_variates_state(variates, state):
+    generator = variates.generator
+
+    variates.uniforms = []
+    if state["uniform_state"] is not None:
+        generator.bit_generator.state = state["uniform_state"]
+        variates.uniforms = generator.random(state["uniform_size"]).tolist()
+
+    variates.exponentials = []
+    if state["exponential_state"] is not None:
+        generator.bit_generator.state = state["exponential_state"]
+        variates.exponentials = generator.standard_exponential(
+            state["exponential_size"]
+        ).tolist()
+
+    variates.uniform_state = state["uniform_state"]
+    variates.exponential_state = state["exponential_state"]
+
+    generator.bit_generator.state = state["generator"]
+    variates.uniform_index = state["uniform_index"]
+    variates.exponential_index = state["exponential_index"]
+
+
+def get_transaction_state(transaction):
+    return (
+        transaction.creation_time,
+        transaction.amount,
+        None if transaction.sender is None else transaction.sender.id,
+        transaction.receiver.id,
+        transaction.size,
+        transaction.fee_rate,
+    )
+
+
+def make_transaction(state, wallets):
+    """
+    Rebuilds a waiting transaction without the checks and balance changes of Transaction.__init__,
+    which already happened before the checkpoint.
+    """
+    creation_time, amount, sender_id, receiver_id, size, fee_rate = state
+
+    transaction = Transaction.__new__(Transaction)
+    transaction.size = size
+    transaction.fee_rate = fee_rate
+    transaction.creation_time = creation_time
+    transaction.proceess_time = None
+    transaction.sender = None if sender_id is None else wallets[sender_id]
+    transaction.receiver = wallets[receiver_id]
+    transaction.amount = amount
+    transaction.type = "Reward" if sender_id is None else "Transaction"
+
+    return transaction
+
+
+def get_checkpoint_state(
+    env, blockchain, wallets, miners, nodes, stats, streams, workload
+):
+    """
+    Returns the state of a simulation between two blocks as plain data.
+
+    Retained historical blocks and their transactions are left out, only the block being mined is kept.
+    The gossip has nothing in flight between blocks, so it is not saved either. Nor is the network, which a resumed
+    run draws again from the same seed.
+    """
+    pool = blockchain.tx_pool
+    if pool.key is None:
+        waiting = list(pool.queue)
+    else:
+        waiting = [entry[2] for entry in sorted(pool.queue, key=lambda x: x[:2])]
+
+    block = blockchain.current_block
+
+    return {
+        "version": CHECKPOINT_VERSION,
+        "now": env.now,
+        "blockchain": {
+            "total_blocks": blockchain.total_blocks,
+            "total_transactions": blockchain.total_transactions,
+            "coins": blockchain.coins,
+            "total_fees": blockchain.total_fees,
+            "stop_process": blockchain.stop_process,
+            "latencies": get_histogram_state(blockchain.latencies),
+            "front": [get_transaction_state(t) for t in pool.front],
+            "waiting": [get_transaction_state(t) for t in waiting],
+            "current_block": {
+                "id": block.block_id,
+                "timestamp": block.timestamp,
+                "time_since_last_block": block.time_since_last_block,
+            },
+        },
+        "wallets": [
+            (wallet.id, wallet.balance, wallet.tx_in, wallet.tx_out)
+            for wallet in wallets
+        ],
+        "miners": [
+            (miner.id, miner.hashrate, miner.node.id, miner.wallet.id)
+            for miner in miners
+        ],
+        "nodes": [
+            {
+                "id": node.id,
+                "ledger": list(node.ledger),
+                "ledger_size": node.ledger_size,
+                "tip": node.tip,
+                "total_io_requests": node.total_io_requests,
+                "network_usage": node.network_usage,
+                "broadcast_times": get_ring_state(node.broadcast_times),
+                "uplink_free": node.uplink_free,
+                "known_transactions": node.known_transactions,
+                "missing_transactions": node.missing_transactions,
+            }
+            for node in nodes
+        ],
+        "stats": {
+            "difficulty": stats.difficulty,
+            "block_times": get_ring_state(stats.block_times),
+            "total_times": get_ring_state(stats.total_times),
+            "last_print_time": stats.last_print_time,
+            "old_fees": stats.old_fees,
+            "print_dict": dict(stats.print_dict),
+            "latencies": get_histogram_state(stats.latencies),
+        },
+        "streams": {
+            "seed": streams.seed,
+            "topology": streams.topology.getstate(),
+            "mining": get_variates_state(streams.mining),
+            "transactions": get_variates_state(streams.transactions),
+            "mining_batch": streams.mining_batch.bit_generator.state,
+            "relay": streams.relay.bit_generator.state,
+            "sizes": streams.sizes.bit_generator.state,
+        },
+        "workload": {
+            "tx_count": workload.tx_count,
+            "next_tick": workload.next_tick,
+            "arrivals": dict(vars(workload.arrivals)),
+        },
+    }
+
+
+def save_checkpoint(path, state):
+    """
+    Writes a checkpoint as a gzipped pickle of plain data.
+
+    The file is written next to path and then moved over it, so an interrupted save never leaves a broken checkpoint.
+    """
+    temporary = f"{path}.tmp"
+    with gzip.open(temporary, "wb", compresslevel=1) as file:
+        pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
+
+
+def load_checkpoint(path):
+    """
+    Reads a checkpoint written by save_checkpoint.
+
+    Raises:
+        ValueError: If the checkpoint was written by an incompatible version.
+    """
+    with gzip.open(path, "rb") as file:
+        state = pickle.load(file)
+
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(
+            f"Checkpoint version {state.get('version')} is not supported (expected {CHECKPOINT_VERSION})"
+        )
+
+    return state
+
+
+def restore_checkpoint(
+    state, env, blockchain, wallets, miners, nodes, streams, workload
+):
+    """
+    Loads a checkpoint into freshly created simulation objects. The Stats are restored by restore_stats.
+
+    The objects must have been created with the same number of wallets, miners and nodes as the checkpointed run,
+    the nodes from streams spawned from the checkpoint's seed, and env must start at the checkpoint's time.
+
+    Raises:
+        ValueError: If the objects do not match the checkpoint.
+    """
+    if (
+        len(state["wallets"]) != len(wallets)
+        or len(state["miners"]) != len(miners)
+        or len(state["nodes"]) != len(nodes)
+    ):
+        raise ValueError(
+            "Checkpoint does not match the number of wallets, miners or nodes"
+        )
+
+    if env.now != state["now"]:
+        raise ValueError("The environment must start at the checkpoint's time")
+
+    wallets_by_id = {wallet.id: wallet for wallet in wallets}
+    for wallet_id, balance, tx_in, tx_out in state["wallets"]:
+        wallet = wallets_by_id[wallet_id]
+        wallet.balance = balance
+        wallet.tx_in = tx_in
+        wallet.tx_out = tx_out
+
+    nodes_by_id = {node.id: node for node in nodes}
+    for node_state in state["nodes"]:
+        node = nodes_by_id[node_state["id"]]
+        node.ledger = deque(node_state["ledger"], maxlen=node.ledger.maxlen)
+        node.seen = set(node.ledger)
+        node.ledger_size = node_state["ledger_size"]
+        node.tip = node_state["tip"]
+        node.total_io_requests = node_state["total_io_requests"]
+        node.network_usage = node_state["network_usage"]
+        set_ring_state(node.broadcast_times, node_state["broadcast_times"])
+        node.uplink_free = node_state["uplink_free"]
+        node.known_transactions = node_state["known_transactions"]
+        node.missing_transactions = node_state["missing_transactions"]
+
+    for miner, (miner_id, hashrate, node_id, wallet_id) in zip(
+        miners, state["miners"]
+    ):
+        miner.id = miner_id
+        miner.hashrate = hashrate
+        miner.node = nodes_by_id[node_id]
+        miner.wallet = wallets_by_id[wallet_id]
+
+    # Delay models were computed for the topology the objects were created with
+    if nodes and nodes[0].delay_model is not None:
+        nodes[0].delay_model.cache.clear()
+
+    chain = state["blockchain"]
+    blockchain.total_blocks = chain["total_blocks"]
+    blockchain.total_transactions = chain["total_transactions"]
+    blockchain.coins = chain["coins"]
+    blockchain.total_fees = chain["total_fees"]
+    blockchain.stop_process = chain["stop_process"]
+    set_histogram_state(blockchain.latencies, chain["latencies"])
+
+    blockchain.tx_pool.front.clear()
+    blockchain.tx_pool.queue.clear()
+    blockchain.tx_pool.front.extend(
+        make_transaction(t, wallets_by_id) for t in chain["front"]
+    )
+    blockchain.tx_pool.extend(
+        [make_transaction(t, wallets_by_id) for t in chain["waiting"]]
+    )
+
+    block = Block(
+        env,
+        id=chain["current_block"]["id"],
+        blocksize=blockchain.blocksize,
+        ledger=blockchain.ledger,
+        max_bytes=blockchain.block_bytes,
+    )
+    block.timestamp = chain["current_block"]["timestamp"]
+    block.time_since_last_block = chain["current_block"]["time_since_last_block"]
+    blockchain.blocks.clear()
+    blockchain.current_block = block
+
+    streams.seed = state["streams"]["seed"]
+    streams.topology.setstate(state["streams"]["topology"])
+    set_variates_state(streams.mining, state["streams"]["mining"])
+    set_variates_state(streams.transactions, state["streams"]["transactions"])
+    streams.mining_batch.bit_generator.state = state["streams"]["mining_batch"]
+    streams.relay.bit_generator.state = state["streams"]["relay"]
+    streams.sizes.bit_generator.state = state["streams"]["sizes"]
+
+    workload.tx_count = state["workload"]["tx_count"]
+    workload.next_tick = state["workload"]["next_tick"]
+    vars(workload.arrivals).update(state["workload"]["arrivals"])
+
+
+def restore_stats(stats, state):
+    """
+    Loads the Stats part of a checkpoint into a freshly created Stats.
+    """
+    stats.difficulty = state["stats"]["difficulty"]
+    set_ring_state(stats.block_times, state["stats"]["block_times"])
+    set_ring_state(stats.total_times, state["stats"]["total_times"])
+    stats.last_print_time = state["stats"]["last_print_time"]
+    stats.old_fees = state["stats"]["old_fees"]
+    stats.print_dict.update(state["stats"]["print_dict"])
+    set_histogram_state(stats.latencies, state["stats"]["latencies"])
+
+
+class Checkpointer:
+    """
+    Saves the simulation every interval blocks.
+
+    Attributes:
+        path: The checkpoint file. Each save replaces the last one.
+        interval: The number of blocks between checkpoints.
+    """
+
+    def __init__(
+        self, path, interval, env, blockchain, wallets, miners, nodes, streams, workload
+    ):
+        if interval <= 0:
+            raise ValueError("Checkpoint interval must be greater than 0")
+
+        self.path = path
+        self.interval = interval
+        self.env = env
+        self.blockchain = blockchain
+        self.wallets = wallets
+        self.miners = miners
+        self.nodes = nodes
+        self.streams = streams
+        self.workload = workload
+
+    def save(self, stats):
+        save_checkpoint(
+            self.path,
+            get_checkpoint_state(
+                self.env,
+                self.blockchain,
+                self.wallets,
+                self.miners,
+                self.nodes,
+                stats,
+                self.streams,
+                self.workload,
+            ),
+        )
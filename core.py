@@ -1,7 +1,21 @@
 import random
 import time
 import math
-import gc
+from collections import deque
+
+import numpy as np
+
+from mempool import Mempool, FeeMempool
+from feemarket import FeeTiers
+from histogram import LogHistogram
+from ringbuffer import RingBuffer
+from tx_ledger import TransactionLedger
+
+
+# The size of a block before any transactions are added
+BLOCK_BASE_SIZE = 1024
+# The size of a transaction without a size distribution, e.g. a block reward
+TRANSACTION_SIZE = 256
 
 
 class Node:
@@ -12,10 +26,25 @@ class Node:
 
     Attributes:
         env: The environment.
-        neighbors: The neighbors of the node. This is a list of Node Objects that the node can communicate with.
         max_neighbors: The maximum number of neighbors the node can have.
         id: The id of the node.
-        ledger: The ledger of the node. This is a list of Block Objects that the node has added to its ledger.
+        ledger: The ids of the most recent blocks the node has added to its ledger, oldest first.
+        ledger_size: The number of blocks the node has ever added to its ledger.
+        tip: The highest block id in the node's ledger, or the tip of its block tree if it has one.
+        gossip: The Gossip the node sends blocks through. Shared by every node in the network.
+        seen: The ids in the ledger as a set, used to drop duplicates.
+        uplink_free: The time the node's uplink finishes its queued sends.
+        delay_model: The DelayModel charging blocks mined on this node, if propagation is precomputed.
+        topology: The Topology the neighbors are read from, if any. Shared by every node in the network.
+        first_link: The position of the node's first neighbor in the topology's arrays.
+        degree: The number of neighbors the node has in the topology.
+        peers: The nodes of the network by id, which the topology's neighbor ids resolve to. Shared by every node.
+        relay: The relay protocol blocks are sent with, or None to send full blocks to every neighbor.
+        mempool_overlap: The assumed probability a block's transaction is already in the node's pool, for compact relay.
+        requested: The ids of blocks the node has asked a neighbor for and is waiting on.
+        known_transactions: The number of relayed blocks' transactions the node already had.
+        missing_transactions: The number of relayed blocks' transactions the node had to fetch.
+        tree: The BlockTree of competing blocks the node has seen, if forks are modelled.
     """
 
     def __init__(
@@ -25,108 +54,241 @@ class Node:
         id=None,
         num_neighbors=float("inf"),
         latency=0,
+        gossip=None,
+        ledger_window=1000,
     ):
         """
         Initializes a node.
         """
         self.env = env
-        self.neighbors = []
         self.max_neighbors = num_neighbors
         self.id = id
-        self.ledger = []
+        self.ledger = deque(maxlen=ledger_window)
         self.ledger_size = 0
+        self.tip = None
         self.total_io_requests = 0
         self.network_usage = 0
         self.bandwidth = bandwidth
-        self.broadcast_times = []
+        self.broadcast_times = RingBuffer()
         self.latency = latency
-        self.last_block = None
+        self.gossip = gossip
+        self.seen = set()
+        self.uplink_free = 0
+        self.delay_model = None
+        self.topology = None
+        self.first_link = 0
+        self.degree = 0
+        self.peers = None
+        self.relay = None
+        self.mempool_overlap = 1.0
+        self.requested = set()
+        self.known_transactions = 0
+        self.missing_transactions = 0
+        self.tree = None
 
     def mine_block(self, block):
         """
         Mines a block and adds it to the blockchain. As well as broadcasts the block to all neighbors.
+
+        Waits until the block has finished spreading through the network.
+        """
+        # Precomputed delays charge every node at once instead of relaying the block
+        if self.delay_model is not None:
+            yield self.env.timeout(self.delay_model.charge(self, block))
+            return
+
+        if self.gossip is None:
+            raise ValueError("Node has no gossip - init_nodes() not used")
+
+        self.add_block(block)
+        self.gossip.start(block)
+        self.broadcast_update(block)
+        yield self.gossip.wait(block)
+
+    @property
+    def neighbors(self):
+        """
+        The neighbors of the node as Node objects, resolved from the topology's arrays each time they are read.
+        """
+        return [self.peers[id] for id in self.get_neighbor_ids()]
+
+    def get_neighbor_ids(self):
+        """
+        Returns the ids of the node's neighbors, in link order.
+        """
+        if self.topology is None:
+            return []
+        return self.topology.targets[
+            self.first_link : self.first_link + self.degree
+        ].tolist()
+
+    def get_link_latency(self, index):
         """
+        Returns the latency of the link to the neighbor at index. Links without their own latency use the node's.
+        """
+        if self.topology is None or self.topology.latencies is None:
+            return self.latency
+        return float(self.topology.latencies[self.first_link + index])
+
+    def get_link_bandwidth(self, index):
+        """
+        Returns the bandwidth of the link to the neighbor at index. Links without their own bandwidth use the node's.
+        """
+        if self.topology is None or self.topology.bandwidths is None:
+            return self.bandwidth
+        return float(self.topology.bandwidths[self.first_link + index])
+
+    def add_block(self, block, latency=0):
+        """
+        Adds a block the node has not seen before to its ledger.
+
+        Only the last ledger_window ids are kept, so the ledger takes the same memory however long the run is.
+        A node with a block tree follows the tree's tip, which can move back to a lower id after a reorg.
+
+        Args:
+            block (Block): The block to add.
+            latency (float): The time the block took to reach the node. Optional, defaults to 0.
+        """
+        if len(self.ledger) == self.ledger.maxlen:
+            self.seen.discard(self.ledger[0])
         self.ledger.append(block.block_id)
-        self.ledger_size += 1
-        self.last_block = block
-        yield self.env.process(self.broadcast_update(block))
-        self.resize_ledger()
+        self.seen.add(block.block_id)
 
-    def broadcast_update(self, block, latency=0):
+        self.ledger_size += 1
+        if self.tree is not None:
+            self.tree.add(block.block_id, block.parent_id, block.work)
+            self.tip = self.tree.tip
+        elif self.tip is None or block.block_id > self.tip:
+            self.tip = block.block_id
+        self.broadcast_times.append(latency)
+        block.network_time += latency
+
+    def broadcast_update(self, block, exclude=None):
         """
-        Broadcasts the block to all neighbors.
+        Sends the block to all neighbors at once.
+
+        The sends share the node's uplink, so with a finite bandwidth each copy finishes transmitting one
+        block size / bandwidth after the one before it, then arrives after the latency.
+        Topologies with per-link latencies or bandwidths use the link's instead of the node's.
 
         Args:
             block (Block): The block to broadcast.
-            latency (float): The latency of the block. Optional, defaults to 0.
+            exclude (Node): The neighbor the block came from, which is not sent it back. Optional, defaults to None.
         """
 
+        # Relay protocols send their own messages instead of the full block
+        if self.relay is not None:
+            self.relay.announce(self, block, exclude)
+            return
+
         # If the bandwidth is not infinite, the broadcast time is the size of the block divided by the bandwidth
         if self.bandwidth != float("inf"):
             broadcast_time = block.size / self.bandwidth
         else:
             broadcast_time = 0
 
-        if len(self.broadcast_times) < self.ledger_size:
-            self.broadcast_times.append(0)
+        sent = max(self.env.now, self.uplink_free)
 
-        for i in range(len(self.neighbors)):
-            neighbor = self.neighbors[i]
+        latencies = bandwidths = None
+        if self.topology is not None:
+            latencies = self.topology.latencies
+            bandwidths = self.topology.bandwidths
 
-            # Checks if neighbor already has the block
-            if neighbor.last_block is not None:
-                if neighbor.last_block == block:
-                    continue
+        exclude_id = None if exclude is None else exclude.id
+        for index, neighbor_id in enumerate(self.get_neighbor_ids()):
+            if neighbor_id == exclude_id:
+                continue
+
+            if latencies is None:
+                latency = self.latency
+            else:
+                latency = float(latencies[self.first_link + index])
+
+            if bandwidths is not None:
+                broadcast_time = block.size / float(bandwidths[self.first_link + index])
+
+            sent += broadcast_time
 
             self.total_io_requests += 1
             self.network_usage += block.size
             self.broadcast_times[-1] += latency + broadcast_time
+            block.network_time += latency + broadcast_time
 
-            # If the latency is not 0, the block is received with the latency of the node + the broadcast time
-            if latency != 0:
-                yield self.env.process(
-                    neighbor.receive_block(block, self.latency + broadcast_time)
-                )
-            else:
-                yield self.env.process(
-                    neighbor.receive_block(block, latency=self.latency)
-                )
+            self.gossip.send(
+                block,
+                self,
+                self.peers[neighbor_id],
+                delay=sent - self.env.now + latency,
+            )
 
-    def receive_block(self, block, latency=0):
+        self.uplink_free = sent
+
+    def send(self, block, index, size, handler, timed=True):
         """
-        Receives a block from a neighbor and adds it to the blockchain if it's valid.
-        If the block is the same as the last block in the blockchain, it does nothing.
-        If the block has an invalid ID, the last block in the blockchain is replaced with the new block if it's newer.
-        (Although this shouldn't happen, it's caught in broadcast_update)
+        Sends one relay message about a block to the neighbor at index, queued on the node's uplink.
 
         Args:
-            block (Block): The block to receive.
-            latency (float): The latency of the block. Optional, defaults to 0.
+            block (Block): The block the message is about.
+            index (int): The position of the neighbor in the node's links.
+            size (int): The size of the message in bytes.
+            handler (callable): Called as handler(receiver, block, sender, latency) when the message arrives.
+            timed (bool, optional): Whether the send counts towards the block's broadcast time.
+                False for requests sent before the node has the block. Defaults to True.
         """
+        latency = self.get_link_latency(index)
+        bandwidth = self.get_link_bandwidth(index)
+        transmit = size / bandwidth if bandwidth != float("inf") else 0
 
-        self.ledger.append(block.block_id)
-        self.ledger_size += 1
+        self.uplink_free = max(self.env.now, self.uplink_free) + transmit
 
         self.total_io_requests += 1
+        self.network_usage += size
+        if timed:
+            self.broadcast_times[-1] += latency + transmit
+            block.network_time += latency + transmit
+
+        self.gossip.send(
+            block,
+            self,
+            self.peers[int(self.topology.targets[self.first_link + index])],
+            delay=self.uplink_free - self.env.now + latency,
+            handler=handler,
+        )
 
-        yield self.env.timeout(latency + block.size / self.bandwidth)
-        if len(self.broadcast_times) < self.ledger_size:
-            self.broadcast_times.append(0)
+    def send_to(self, neighbor, block, size, handler, timed=True):
+        """
+        Sends one relay message to a neighbor. See send.
+        """
+        self.send(
+            block, self.get_neighbor_ids().index(neighbor.id), size, handler, timed
+        )
 
-        self.broadcast_times[-1] += latency + block.size / self.bandwidth
+    def accept_block(self, block, sender, latency=0):
+        """
+        Adds a block the node has not seen before and relays it to every neighbor except the sender.
+        """
+        self.add_block(block, latency)
+        self.broadcast_update(block, exclude=sender)
+
+    def receive_block(self, block, sender, latency=0):
+        """
+        Receives a block from a neighbor. Called by the gossip when the block arrives.
+
+        A block the node has already seen is dropped. A new block is added to the ledger and relayed
+        to every neighbor except the sender.
 
-        yield self.env.process(self.broadcast_update(block, latency=self.latency))
+        Args:
+            block (Block): The block to receive.
+            sender (Node): The neighbor that sent the block.
+            latency (float): The time the block took to arrive. Optional, defaults to 0.
+        """
 
-        self.last_block = block
+        self.total_io_requests += 1
 
-        self.resize_ledger()
+        if block.block_id in self.seen:
+            return
 
-    def resize_ledger(self):
-        if len(self.ledger) > 1000000:
-            old_ledger = self.ledger
-            self.ledger = list(self.ledger[-500000:])
-            del old_ledger
-            gc.collect()
+        self.accept_block(block, sender, latency)
 
     def __eq__(self, other):
         if self.id == other.id:
@@ -146,8 +308,10 @@ class Miner:
         env: The environment.
         hashrate: The hashrate of the miner.
         mine_time: The time it takes to mine a block.
+        selector: The WinnerSelector the miner belongs to, if any.
         node: The node that the miner is on.
         wallet: The wallet of the miner.
+        rng: The random number stream mine times are drawn from.
     """
 
     def __init__(
@@ -157,9 +321,12 @@ class Miner:
         node=None,
         hashrate=None,
         wallet=None,
+        rng=random,
     ):
         self.id = id
+        self.rng = rng
         self.env = env
+        self.selector = None
         self.hashrate = hashrate
         self.mine_time = None
         self.node = node
@@ -168,6 +335,17 @@ class Miner:
         else:
             self.wallet = wallet
 
+    @property
+    def hashrate(self):
+        return self._hashrate
+
+    @hashrate.setter
+    def hashrate(self, hashrate):
+        # Tells the winner selector to rebuild its cumulative hashrate table
+        self._hashrate = hashrate
+        if self.selector is not None:
+            self.selector.invalidate()
+
     def set_node(self, node: Node):
         self.node = node
 
@@ -182,7 +360,7 @@ class Miner:
             self.mine_time = float("inf")
         else:
 
-            self.mine_time = random.expovariate(self.hashrate / difficulty)
+            self.mine_time = self.rng.expovariate(self.hashrate / difficulty)
 
         return self.mine_time
 
@@ -200,14 +378,29 @@ class Transaction:
     """
     A transaction. This is a single transaction between two wallets.
 
+    Transactions only live while they wait in the pool. Once added to a block they are stored as a row
+    of the BlockChain's TransactionLedger, so the class uses __slots__ to keep waiting transactions small.
+
     Attributes:
-        env: The environment.
         amount: The amount of the transaction.
         receiver: The receiver of the transaction.
+        fee_rate: The fee per byte the sender bids, in fee market mode.
     """
 
-    def __init__(self, env, amount, receiver, sender=None):
-        self.size = 256
+    __slots__ = (
+        "size",
+        "creation_time",
+        "proceess_time",
+        "sender",
+        "receiver",
+        "amount",
+        "type",
+        "fee_rate",
+    )
+
+    def __init__(self, env, amount, receiver, sender=None, subtract=True):
+        self.size = TRANSACTION_SIZE
+        self.fee_rate = 0
         if amount is None:
             raise ValueError("Amount cannot be None")
 
@@ -230,7 +423,9 @@ class Transaction:
 
         # This ensures that the sender's balance is subtracted before the transaction is added to the blockchain
         # This is to prevent the sender from spending more than they have
-        self.subtract_balance()
+        # Batches created by the Workload subtract all their senders' balances at once instead
+        if subtract:
+            self.subtract_balance()
 
     def subtract_balance(self):
         if self.sender is not None:
@@ -240,6 +435,11 @@ class Transaction:
         if self.receiver is not None:
             self.receiver.add_transaction(self)
 
+    def refund_balance(self):
+        # Gives the amount back to the sender of a transaction dropped from the pool
+        if self.sender is not None:
+            self.sender.balance += self.amount
+
     def __eq__(self, other):
         if (
             self.creation_time == other.creation_time
@@ -288,6 +488,13 @@ class Wallet:
             self.tx_out += 1
             self.balance -= transaction.amount
 
+    def add_received(self, amount, count=1):
+        """
+        Credits count received transactions totalling amount at once.
+        """
+        self.tx_in += count
+        self.balance += amount
+
     def __str__(self):
         return f"Wallet(id={self.id}, balance={self.balance})"
 
@@ -311,10 +518,34 @@ class Block:
         transaction_count: The number of transactions in the block.
         size: The size of the block.
         blocksize: The size of the blocks in the blockchain.
-        transactions: The transactions in the block.
+        ledger: The TransactionLedger the block's transactions are stored in.
+        start: The ledger row of the block's first transaction.
+        max_bytes: The most bytes the block can hold, or None to cap it at blocksize transactions instead.
+        parent_id: The id of the block it was mined on, if forks are modelled.
+        work: The difficulty it was mined at, if forks are modelled.
+        network_time: The broadcast time the block has added across every node so far.
     """
 
-    def __init__(self, env, id, blocksize):
+    __slots__ = (
+        "header",
+        "block_id",
+        "timestamp",
+        "env",
+        "time_since_last_block",
+        "transaction_count",
+        "size",
+        "blocksize",
+        "ledger",
+        "start",
+        "max_bytes",
+        "full",
+        "fees",
+        "parent_id",
+        "work",
+        "network_time",
+    )
+
+    def __init__(self, env, id, blocksize, ledger=None, max_bytes=None):
         self.header = None
         self.block_id = id
         self.timestamp = env.now
@@ -323,32 +554,88 @@ class Block:
         self.transaction_count = 0
 
         # Base size taken up by the header
-        self.size = 1024
+        self.size = BLOCK_BASE_SIZE
         self.blocksize = blocksize
-        self.transactions = []
+        self.ledger = ledger
+        self.start = None
+        self.max_bytes = max_bytes
         self.full = False
         self.fees = 0
+        self.parent_id = None
+        self.work = 0
+        self.network_time = 0
 
-    def add_transaction(self, transaction):
+    def add_transaction(self, transaction, fee=0):
         """
         Adds a transaction to the block. Checks if the block is full and raises an error if it is.
 
+        The transaction is written to the ledger. Blocks are filled one at a time, so a block's transactions
+        are the consecutive rows from start.
+
         Args:
             transaction (Transaction): The transaction to add.
+            fee (float, optional): The fee taken from the transaction. Defaults to 0.
         """
 
         if self.full:
             raise ValueError("Block is full - transaction not added")
 
+        if self.ledger is None:
+            raise ValueError("Block has no ledger - transaction not added")
+
+        if self.max_bytes is not None and self.size + transaction.size > self.max_bytes:
+            raise ValueError("Transaction does not fit in the block - not added")
+
         transaction.proceess_time = self.env.now
-        self.transactions.append(transaction)
+        row = self.ledger.append(transaction, self.env.now, fee)
+        if self.start is None:
+            self.start = row
         self.transaction_count += 1
         self.size += transaction.size
 
         # +1 because the block size is the number of transactions + 1 reward transaction
-        if len(self.transactions) >= self.blocksize + 1:
+        if self.max_bytes is None and self.transaction_count >= self.blocksize + 1:
             self.full = True
 
+    def add_transactions(self, start, count, size):
+        """
+        Adds a batch of transactions already written to the ledger.
+
+        Args:
+            start (int): The ledger row of the first transaction.
+            count (int): The number of transactions.
+            size (int): Their total size in bytes.
+        """
+        if self.start is None:
+            self.start = start
+        self.transaction_count += count
+        self.size += size
+
+        if self.max_bytes is None and self.transaction_count >= self.blocksize + 1:
+            self.full = True
+
+    def get_space(self):
+        """
+        Returns the number of transactions and the number of bytes that still fit in the block.
+
+        Returns:
+            tuple: The count, or None in byte capacity mode, and the bytes, or None outside it.
+        """
+        if self.max_bytes is None:
+            return self.blocksize + 1 - self.transaction_count, None
+        return None, self.max_bytes - self.size
+
+    def get_transactions(self):
+        """
+        Returns the block's transactions as ledger rows.
+
+        Returns:
+            list: (creation_time, process_time, sender_id, receiver_id, amount, fee) tuples.
+        """
+        if self.transaction_count == 0:
+            return []
+        return self.ledger.get_rows(self.start, self.transaction_count)
+
     def __repr__(self):
         return f"Block(id={self.block_id}, timestamp={self.timestamp}, time_since_last_block={self.time_since_last_block}, transaction_count={self.transaction_count}, size={self.size})"
 
@@ -373,32 +660,67 @@ class BlockChain:
 
     Attributes:
         env: The environment.
-        blocks: The blocks in the blockchain.
+        blocks: The most recent blocks in the blockchain, oldest first.
         total_transactions: The total number of transactions in the blockchain.
         blocksize: The size of the blocks in the blockchain.
         coins: The total number of coins in the blockchain.
         reward: The reward for mining a block.
         halving: The number of blocks until the reward is halved.
         fee: The fee for each transaction as a percentage of the transaction amount.
-        tx_pool: The queue of transactions to be added to the blockchain.
+        tx_pool: The Mempool of transactions to be added to the blockchain.
+        ledger: The TransactionLedger holding the transactions of the retained blocks.
+        fee_priority: Whether the pool hands out the highest fee transactions first instead of FIFO.
+        fee_market: Whether transactions pay the fee rate they bid instead of fee, highest fee rate first.
+        fee_tiers: The FeeTiers confirmation latencies are recorded in, in fee market mode.
+        block_bytes: The most bytes a block holds, or None to cap blocks at blocksize transactions.
+        latencies: The LogHistogram of the confirmation latencies of transactions added since Stats last printed.
         current_block: The current block being mined.
         stop_process: Whether the process should stop.
         total_fees: The total fees in the blockchain.
     """
 
-    def __init__(self, env, blocksize, reward, halving, fee=0):
+    def __init__(
+        self,
+        env,
+        blocksize,
+        reward,
+        halving,
+        fee=0,
+        fee_priority=False,
+        history=1000,
+        fee_market=False,
+        pool_bytes=None,
+        block_bytes=None,
+    ):
         self.env = env
-        self.blocks = []
+
+        # Only the last block is ever read, so old blocks are dropped (and freed) as new ones are added
+        self.blocks = deque(maxlen=history)
+        self.ledger = TransactionLedger()
         self.total_blocks = 0
         self.total_transactions = 0
         self.blocksize = blocksize
+        self.block_bytes = block_bytes
         self.coins = 0
         self.reward = reward
 
         self.halving = halving
         self.fee = fee
         self.total_fees = 0
-        self.tx_pool = []
+        self.fee_priority = fee_priority
+        self.fee_market = fee_market
+        self.latencies = LogHistogram()
+        self.fee_tiers = None
+        if fee_market:
+            # Blocks are built from the highest fee rates, the pool evicting the lowest past pool_bytes
+            self.tx_pool = FeeMempool(max_bytes=pool_bytes)
+            self.fee_tiers = FeeTiers()
+        elif fee_priority:
+            self.tx_pool = Mempool(
+                key=lambda transaction: transaction.amount * self.fee
+            )
+        else:
+            self.tx_pool = Mempool()
         self.stop_process = False
 
         self.create_block(env)
@@ -420,44 +742,102 @@ class BlockChain:
 
     def finalize_block(self):
         """Finalizes the current block and adds it to the blockchain. Also adds the reward to the miner's wallet.
-        Also adds the transactions to the block from the transaction queue until the block is full.
+        Also adds the transactions to the block from the transaction queue until the block is full,
+        by transaction count or, with block_bytes, by size.
 
         Args:
             winning_miner (Miner): The miner that won the block.
         """
 
         block = self.current_block
+        count, space = block.get_space()
 
-        # Adds transactions to the block from the transaction queue until the block is full
+        # Takes every transaction that fits at once, then adds them to the block as one batch
+        # A fee market pool pops the highest fee rates, so building the block costs O(k log n) for k transactions
         if len(self.tx_pool) != 0:
-            while not block.full:
-                transaction = self.tx_pool.pop(0)
+            transactions = self.tx_pool.pop_many(count, space)
+            if transactions:
+                self.fill_block(block, transactions)
 
-                # If the transaction is a transaction and not a reward, add the fee to the block fees
-                if transaction.type == "Transaction":
-                    fee = transaction.amount * self.fee
+            # A byte capacity block is full once the next transaction does not fit
+            if block.max_bytes is not None and len(self.tx_pool) != 0:
+                block.full = True
 
-                    transaction.amount -= fee
+        self.blocks.append(self.current_block)
 
-                    if transaction.amount < 0:
-                        raise ValueError(
-                            "Transaction amount is less than 0. This should not happen."
-                        )
+        # Rows of blocks that have been dropped are no longer needed
+        if self.blocks[0].start is not None:
+            self.ledger.trim(self.blocks[0].start)
 
-                    self.current_block.fees += fee
+        self.total_transactions += block.transaction_count
 
-                    self.total_fees += fee
+    def fill_block(self, block, transactions):
+        """
+        Adds a batch of transactions taken from the pool to a block.
+
+        Fees, amounts and latencies are worked out with NumPy over the whole batch, the rows are written to the
+        ledger at once, and each receiver is credited once with the total it got, as fast forward does for rewards.
 
-                # Processes the receiver of transaction
-                transaction.add_balance()
-                block.add_transaction(transaction)
+        Args:
+            block (Block): The block being finalized.
+            transactions (list): The transactions, in the order they were taken.
+        """
+        n = len(transactions)
+        now = self.env.now
 
-                if len(self.tx_pool) == 0:
-                    break
+        amounts = np.fromiter((t.amount for t in transactions), dtype=float, count=n)
+        sizes = np.fromiter((t.size for t in transactions), dtype=np.int64, count=n)
+        creation_times = np.fromiter(
+            (t.creation_time for t in transactions), dtype=float, count=n
+        )
+        sender_ids = np.fromiter(
+            (-1 if t.sender is None else t.sender.id for t in transactions),
+            dtype=np.int64,
+            count=n,
+        )
+        receivers = [t.receiver for t in transactions]
+        receiver_ids = np.fromiter(
+            (wallet.id for wallet in receivers), dtype=np.int64, count=n
+        )
 
-        self.blocks.append(self.current_block)
+        # Rewards pay no fee and are not waiting on a block
+        paid = sender_ids >= 0
+        latencies = (now - creation_times)[paid]
 
-        self.total_transactions += block.transaction_count
+        fees = np.zeros(n)
+        if self.fee_market:
+            # The fee the sender bid, never more than it sends
+            fee_rates = np.fromiter(
+                (t.fee_rate for t in transactions), dtype=float, count=n
+            )
+            fees[paid] = np.minimum(fee_rates * sizes, amounts)[paid]
+            self.fee_tiers.record(fee_rates[paid], latencies)
+        else:
+            fees[paid] = amounts[paid] * self.fee
+
+        amounts -= fees
+        if np.any(amounts < 0):
+            raise ValueError("Transaction amount is less than 0. This should not happen.")
+
+        fee_total = float(fees.sum())
+        block.fees += fee_total
+        self.total_fees += fee_total
+
+        # Processes the receivers of the transactions
+        _, first, inverse = np.unique(
+            receiver_ids, return_index=True, return_inverse=True
+        )
+        totals = np.bincount(inverse, weights=amounts)
+        counts = np.bincount(inverse)
+        for i, total, count in zip(first.tolist(), totals.tolist(), counts.tolist()):
+            receivers[i].add_received(total, count)
+
+        start = self.ledger.extend(
+            creation_times, now, sender_ids, receiver_ids, amounts, fees
+        )
+        block.add_transactions(start, n, int(sizes.sum()))
+
+        self.latencies.record_many(latencies)
 
     def create_block(self, env, winning_miner=None):
         """
@@ -470,8 +850,13 @@ class BlockChain:
             env (simpy.Environment): The environment.
             winning_miner (Miner, optional): The miner that won the block. Defaults to None.
         """
-        block = Block(env, id=self.total_blocks, blocksize=self.blocksize)
-        block.transactions = []
+        block = Block(
+            env,
+            id=self.total_blocks,
+            blocksize=self.blocksize,
+            ledger=self.ledger,
+            max_bytes=self.block_bytes,
+        )
         block.timestamp = env.now
 
         block.time_since_last_block = (
@@ -486,27 +871,17 @@ class BlockChain:
                 receiver=winning_miner.wallet,
             )
             self.coins += reward_amount
-            self.tx_pool.insert(0, reward_transaction)
+            self.tx_pool.push_front(reward_transaction)
 
         self.current_block = block
         self.total_blocks += 1
 
-        # Keeps the blockchain to 500,000 blocks
-        # This prevents memory issues with the blockchain
-        if len(self.blocks) > 1000000:
-
-            # Clear internal data of old blocks
-            for old_block in self.blocks[:-500000]:
-                old_block.__dict__.clear()
-
-            # Now slice and reallocate the list
-            self.blocks = list(self.blocks[-500000:])
-
-            gc.collect()
-
     def add_transaction(self, transaction):
         self.tx_pool.append(transaction)
 
+    def add_transactions(self, transactions):
+        self.tx_pool.extend(transactions)
+
     def get_current_block(self):
         return self.current_block
 
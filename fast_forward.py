@@ -0,0 +1,298 @@
+import math
+import random
+from collections import deque
+
+import numpy as np
+
+from core import Block, Transaction
+from stats import Stats
+
+
+def issued_coins(reward, halving, first, last):
+    """
+    Returns the coins issued by the rewards created while total_blocks runs from first to last (inclusive).
+
+    This is the closed form of summing BlockChain.create_reward over those blocks without fees.
+    """
+    if last < first:
+        return 0
+
+    if halving == 0:
+        return reward * (last - first + 1)
+
+    coins = 0
+    era = first // halving
+    while era * halving <= last:
+        start = max(first, era * halving)
+        end = min(last, (era + 1) * halving - 1)
+        coins += reward * (0.5**era) * (end - start + 1)
+        era += 1
+
+    return coins
+
+
+def get_propagation_counts(nodes, origin):
+    """
+    Returns how a block mined on origin changes each node's counters as it reaches the network.
+
+    On a zero latency network the gossip delivers blocks in breadth-first order. Every node that receives the
+    block for the first time relays it to all neighbors but the sender, and every copy sent is counted as
+    received, including the duplicates the receiver drops.
+
+    Args:
+        nodes (list): The nodes.
+        origin (Node): The node the block was mined on.
+
+    Returns:
+        tuple: Arrays of blocks sent, blocks received and ledger entries added per node, indexed by position in nodes.
+    """
+    position = {node.id: i for i, node in enumerate(nodes)}
+    sends = np.zeros(len(nodes))
+    receives = np.zeros(len(nodes))
+    ledger = np.zeros(len(nodes))
+
+    seen = {origin.id}
+    ledger[position[origin.id]] += 1
+    queue = deque([(origin, None)])
+    while queue:
+        node, sender = queue.popleft()
+        for neighbor in node.neighbors:
+            if neighbor is sender:
+                continue
+            sends[position[node.id]] += 1
+            receives[position[neighbor.id]] += 1
+            if neighbor.id in seen:
+                continue
+            seen.add(neighbor.id)
+            ledger[position[neighbor.id]] += 1
+            queue.append((neighbor, node))
+
+    return sends, receives, ledger
+
+
+def fast_forward_mining(
+    env,
+    miners,
+    blockchain,
+    blocktime,
+    hashrate,
+    print_interval,
+    nodes,
+    years,
+    diff_interval=2016,
+    difficulty=None,
+    blocks=None,
+    batch_size=65536,
+    rng=None,
+    metrics=None,
+):
+    """Runs a transaction-free simulation without SimPy processes.
+
+    Produces the same Stats output at each print interval as begin_mining. Inter-block times and winners are
+    drawn in NumPy batches at a fixed difficulty, difficulty is retargeted every diff_interval blocks,
+    and coin issuance with halving is computed in closed form. env is only used as the clock that Stats reads.
+
+    Only valid when no wallets transact and the network has no latency and infinite bandwidth,
+    so that every block's total time is its mining time.
+
+    Args:
+        env (simpy.Environment): The environment.
+        miners (list): The miners.
+        blockchain (BlockChain): The blockchain.
+        blocktime (float): The blocktime.
+        hashrate (int): The hashrate.
+        print_interval (int): The print interval.
+        nodes (list): The nodes.
+        years (int): The number of years.
+        diff_interval (int, optional): The difficulty interval. Defaults to 2016.
+        difficulty (int, optional): The difficulty. Defaults to None.
+        blocks (int, optional): The number of blocks. Defaults to None.
+        batch_size (int, optional): The most blocks drawn in one batch. Defaults to 65536.
+        rng (numpy.random.Generator, optional): The generator the batches are drawn from. Defaults to one seeded from random.
+        metrics (MetricsSink, optional): The sink per-block and per-interval records are written to. Defaults to None.
+
+    Raises:
+        ValueError: If neither blocks nor years are provided, or the run would never end.
+        ValueError: If the miners have no hashrate.
+
+    Returns:
+        Stats: The stats of the run.
+    """
+
+    if difficulty is None:
+        difficulty = blocktime * (hashrate * len(miners))
+
+    if blocks is None and years is None:
+        raise ValueError("Either blocks or years must be provided")
+
+    stats = Stats(
+        env=env,
+        print_interval=print_interval,
+        diff_interval=diff_interval,
+        blocktime=blocktime,
+        hashrate=hashrate,
+        years=years,
+        miners=miners,
+        nodes=nodes,
+        blockchain=blockchain,
+        blocks=blocks,
+        difficulty=difficulty,
+        metrics=metrics,
+    )
+
+    # begin_mining stops once total_blocks (which starts at 1 for the genesis block) reaches the target
+    last = stats.total_blocks - 1
+    if last < 1:
+        raise ValueError("The simulation must run for at least 2 blocks")
+
+    hashrates = np.array([miner.hashrate for miner in miners], dtype=float)
+    cumulative = np.cumsum(hashrates)
+    total_hashrate = cumulative[-1]
+    if total_hashrate == 0:
+        raise ValueError("Miners have no hashrate - no block would ever be mined")
+
+    if rng is None:
+        rng = np.random.default_rng(random.getrandbits(64))
+
+    # Network counters per origin node, applied in bulk for every block mined on it
+    origin_counts = []
+    origin_index = {}
+    miner_origins = []
+    for miner in miners:
+        if miner.node.id not in origin_index:
+            origin_index[miner.node.id] = len(origin_counts)
+            origin_counts.append(get_propagation_counts(nodes, miner.node))
+        miner_origins.append(origin_index[miner.node.id])
+    miner_origins = np.array(miner_origins)
+    miner_ids = np.array([miner.id for miner in miners])
+
+    io_requests = np.zeros(len(nodes))
+    network_usage = np.zeros(len(nodes))
+    ledger_sizes = np.zeros(len(nodes))
+
+    # A finalized block is the header plus its reward transaction
+    block_size = 1024
+    reward_size = 256
+
+    pending = None
+    now = env.now
+    i = 0
+
+    while i < last:
+        next_epoch = (i // diff_interval + 1) * diff_interval
+        next_print = ((i + 1) // print_interval + 1) * print_interval - 1
+        stop = min(next_epoch, next_print, last, i + batch_size)
+        n = stop - i
+
+        scale = math.ceil(stats.difficulty) / total_hashrate
+        mine_times = rng.exponential(scale, n)
+        winners = np.searchsorted(
+            cumulative, rng.random(n) * total_hashrate, side="right"
+        )
+        np.minimum(winners, len(miners) - 1, out=winners)
+
+        # Same left to right accumulation as SimPy advancing env.now one timeout at a time
+        times = np.cumsum(np.concatenate(([now], mine_times)))[1:]
+        now = float(times[-1])
+
+        # Rewards created at iterations i + 1 .. stop. Each is credited when the next block is finalized.
+        iterations = np.arange(i + 1, stop + 1)
+        if blockchain.halving == 0:
+            rewards = np.full(n, float(blockchain.reward))
+        else:
+            rewards = blockchain.reward * (0.5 ** (iterations // blockchain.halving))
+
+        if pending is not None:
+            blockchain.tx_pool.pop()
+            pending.add_balance()
+
+        credited = np.bincount(
+            winners[:-1], weights=rewards[:-1], minlength=len(miners)
+        )
+        credited_count = np.bincount(winners[:-1], minlength=len(miners))
+        for m in np.nonzero(credited_count)[0]:
+            wallet = miners[m].wallet
+            wallet.balance += float(credited[m])
+            wallet.tx_in += int(credited_count[m])
+
+        blockchain.coins += issued_coins(
+            blockchain.reward, blockchain.halving, i + 1, stop
+        )
+
+        # The first iteration finalizes the genesis block, which holds no reward transaction
+        if i == 0:
+            blockchain.total_transactions += n - 1
+        else:
+            blockchain.total_transactions += n
+
+        per_origin = np.bincount(miner_origins[winners], minlength=len(origin_counts))
+        for (sends, receives, ledger), count in zip(origin_counts, per_origin):
+            if count == 0:
+                continue
+            io_requests += count * (sends + receives)
+            network_usage += count * (block_size + reward_size) * sends
+            ledger_sizes += count * ledger
+
+        if i == 0:
+            # The genesis block carries no reward transaction
+            network_usage -= reward_size * origin_counts[miner_origins[winners[0]]][0]
+
+        # Batches never cross a difficulty epoch, so the buffer holds the epoch's times when it is retargeted
+        stats.block_times.extend(mine_times)
+        stats.total_times.extend(mine_times)
+
+        if metrics is not None:
+            # Iterations i + 1 .. stop finalize blocks i .. stop - 1, block 0 being the genesis block
+            transactions = np.ones(n, dtype=np.int64)
+            if i == 0:
+                transactions[0] = 0
+            metrics.write_blocks(
+                {
+                    "block": np.arange(i, stop),
+                    "time": times,
+                    "block_time": mine_times,
+                    "total_time": mine_times,
+                    "transactions": transactions,
+                    "fees": np.zeros(n),
+                    "size": block_size + reward_size * transactions,
+                    "network_time": np.zeros(n),
+                    "difficulty": np.full(n, stats.difficulty),
+                    "miner": miner_ids[winners],
+                }
+            )
+
+        i = stop
+        winner = miners[winners[-1]]
+        if now > env.now:
+            env.run(until=now)
+
+        reward_amount = float(rewards[-1])
+        pending = Transaction(env, amount=reward_amount, receiver=winner.wallet)
+        blockchain.tx_pool.push_front(pending)
+        blockchain.total_blocks = i + 1
+
+        if i % diff_interval == 0:
+            stats.update_difficulty()
+
+        if i == last or blockchain.total_blocks % print_interval == 0:
+            for node, io, usage, count in zip(
+                nodes, io_requests, network_usage, ledger_sizes
+            ):
+                node.total_io_requests = int(io)
+                node.network_usage = float(usage)
+                node.ledger_size = int(count)
+
+            if i == last:
+                blockchain.stop_process = True
+                print(f"End: {stats.get_stats_str()}")
+            else:
+                print(stats.get_stats_str())
+
+    block = Block(env, id=last, blocksize=blockchain.blocksize)
+    block.time_since_last_block = stats.total_times[-1]
+    blockchain.current_block = block
+
+    if blockchain.fee > 0:
+        print(f"Total Fees: {blockchain.total_fees}")
+
+    return stats
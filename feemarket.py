@@ -0,0 +1,55 @@
+import numpy as np
+
+from histogram import LogHistogram
+
+
+class FeeTiers:
+    """
+    Confirmation latency histograms of transactions by the fee rate they bid.
+
+    Tiers are powers of 10 of the fee rate, so a transaction paying 3e-5 per byte is in the 1e-5 tier and the tiers
+    fit any fee rate distribution without being configured. Each tier is a LogHistogram, so tracking them takes
+    the same memory however many transactions are confirmed.
+
+    Attributes:
+        histograms: The LogHistogram of each tier, keyed by the exponent of its lowest fee rate. -inf for no fee.
+    """
+
+    def __init__(self):
+        self.histograms = {}
+
+    def record(self, fee_rates, latencies):
+        """
+        Records the confirmation latencies of a block's transactions.
+
+        Args:
+            fee_rates (array): The fee rate of each transaction.
+            latencies (array): The time each transaction waited to be added to a block.
+        """
+        fee_rates = np.asarray(fee_rates, dtype=float)
+        latencies = np.asarray(latencies, dtype=float)
+        if len(fee_rates) == 0:
+            return
+
+        with np.errstate(divide="ignore"):
+            tiers = np.floor(np.log10(fee_rates))
+
+        for tier in np.unique(tiers).tolist():
+            if tier not in self.histograms:
+                self.histograms[tier] = LogHistogram()
+            self.histograms[tier].record_many(latencies[tiers == tier])
+
+    def get_summary_str(self):
+        lines = ["Confirmation latency by fee rate tier:"]
+
+        for tier in sorted(self.histograms, reverse=True):
+            histogram = self.histograms[tier]
+            label = "0" if tier == float("-inf") else f"{10 ** tier:g}+"
+            lines.append(
+                f"  Fee rate {label}: Tx:{histogram.count}"
+                f" p50:{round(histogram.get_percentile(50), 2)}s"
+                f" p90:{round(histogram.get_percentile(90), 2)}s"
+                f" p99:{round(histogram.get_percentile(99), 2)}s"
+            )
+
+        return "\n".join(lines)
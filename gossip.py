@@ -0,0 +1,79 @@
+class Gossip:
+    """
+    Event-driven block propagation shared by all the nodes of a network.
+
+    Every send is a single SimPy timeout that delivers the block to the neighbor when it fires, so relaying a block
+    never spawns a process per hop and sends from one node to its neighbors are in flight at the same time.
+    The gossip keeps count of the messages still in flight for each block, so the miner can wait until
+    the block has finished spreading through the network.
+
+    Attributes:
+        env: The environment.
+        in_flight: The number of messages still in flight and the event fired when it reaches 0, keyed by block id.
+    """
+
+    def __init__(self, env):
+        self.env = env
+        self.in_flight = {}
+
+    def start(self, block):
+        """
+        Starts tracking the messages of a newly mined block.
+
+        Args:
+            block (Block): The block being broadcast.
+        """
+        self.in_flight[block.block_id] = [0, self.env.event()]
+
+    def send(self, block, sender, receiver, delay, handler=None):
+        """
+        Schedules the delivery of a block, or a relay message about it, to a neighbor.
+
+        Args:
+            block (Block): The block to send.
+            sender (Node): The node sending the block.
+            receiver (Node): The node receiving the block.
+            delay (float): The time until the block arrives at the receiver.
+            handler (callable, optional): Called as handler(receiver, block, sender, delay) on arrival instead of
+                receiver.receive_block, for relay protocol messages. Defaults to None.
+        """
+        self.in_flight[block.block_id][0] += 1
+
+        delivery = self.env.timeout(
+            delay, value=(block, sender, receiver, delay, handler)
+        )
+        delivery.callbacks.append(self.deliver)
+
+    def deliver(self, delivery):
+        """
+        Hands a block to its receiver once the send's timeout fires.
+        """
+        block, sender, receiver, delay, handler = delivery.value
+
+        if handler is None:
+            receiver.receive_block(block, sender, latency=delay)
+        else:
+            handler(receiver, block, sender, delay)
+
+        entry = self.in_flight[block.block_id]
+        entry[0] -= 1
+        if entry[0] == 0:
+            del self.in_flight[block.block_id]
+            entry[1].succeed()
+
+    def wait(self, block):
+        """
+        Returns an event that fires once no messages of the block are in flight.
+
+        Args:
+            block (Block): The block being broadcast.
+
+        Returns:
+            simpy.Event: The event.
+        """
+        pending, done = self.in_flight[block.block_id]
+        if pending == 0:
+            del self.in_flight[block.block_id]
+            done.succeed()
+
+        return done
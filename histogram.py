@@ -0,0 +1,129 @@
+import math
+
+import numpy as np
+
+
+class LogHistogram:
+    """
+    A histogram of positive values in log-spaced buckets, in the style of HdrHistogram.
+
+    Bucket i holds the values from lowest * (1 + precision)^i up to the next bucket, so every value is known to
+    within a relative error of precision however large it is, and the histogram takes the same memory however
+    many values it holds. Values below lowest go in the first bucket and values above highest in the last.
+    Histograms with the same buckets merge by adding their counts.
+
+    Attributes:
+        lowest: The smallest value told apart from 0.
+        highest: The largest value kept to within precision.
+        precision: The relative width of each bucket.
+        counts: The number of values in each bucket.
+        count: The number of values recorded.
+        total: The sum of the values recorded.
+        min: The smallest value recorded.
+        max: The largest value recorded.
+    """
+
+    def __init__(self, lowest=1e-3, highest=1e8, precision=0.01):
+        if not 0 < lowest < highest:
+            raise ValueError("Histogram range must have 0 < lowest < highest")
+
+        if not 0 < precision < 1:
+            raise ValueError("Histogram precision must be between 0 and 1")
+
+        self.lowest = lowest
+        self.highest = highest
+        self.precision = precision
+        self.scale = 1 / math.log1p(precision)
+        self.counts = np.zeros(
+            int(math.log(highest / lowest) * self.scale) + 1, dtype=np.int64
+        )
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def get_index(self, values):
+        """
+        Returns the bucket of each value.
+        """
+        values = np.maximum(values, self.lowest)
+        indices = (np.log(values / self.lowest) * self.scale).astype(np.int64)
+        return np.minimum(indices, len(self.counts) - 1)
+
+    def get_value(self, index):
+        """
+        Returns the middle of a bucket.
+        """
+        return self.lowest * (1 + self.precision) ** (index + 0.5)
+
+    def record(self, value):
+        self.record_many([value])
+
+    def record_many(self, values):
+        """
+        Records a batch of values at once.
+
+        Args:
+            values (array): The values. Negative values are recorded as 0.
+        """
+        values = np.maximum(np.asarray(values, dtype=float), 0)
+        if len(values) == 0:
+            return
+
+        self.counts += np.bincount(self.get_index(values), minlength=len(self.counts))
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other):
+        """
+        Adds another histogram's values to this one.
+
+        Raises:
+            ValueError: If the histograms have different buckets.
+        """
+        if (self.lowest, self.highest, self.precision) != (
+            other.lowest,
+            other.highest,
+            other.precision,
+        ):
+            raise ValueError("Only histograms with the same buckets can be merged")
+
+        self.counts += other.counts
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def reset(self):
+        self.counts[:] = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def get_percentile(self, percentile):
+        """
+        Returns the value below which percentile % of the values fall, to within precision.
+
+        Args:
+            percentile (float): The percentile, between 0 and 100.
+
+        Returns:
+            float: The value, or 0 if nothing has been recorded.
+        """
+        if self.count == 0:
+            return 0
+
+        rank = max(1, math.ceil(percentile / 100 * self.count))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+
+        # The exact extremes are known, so the ends are never off by a bucket
+        return min(max(self.get_value(index), self.min), self.max)
+
+    def get_mean(self):
+        return self.total / self.count if self.count else 0
+
+    def __len__(self):
+        return self.count
@@ -1,12 +1,51 @@
 import random
+
+import numpy as np
+
 from core import Node, Miner, Wallet
+from gossip import Gossip
+from propagation import DelayModel
+from topology import get_topology
+from blocktree import BlockTree
 
 
-def init_nodes(env, num_nodes, max_neighbors, latency, bandwidth):
+def init_nodes(
+    env,
+    num_nodes,
+    max_neighbors,
+    latency,
+    bandwidth,
+    precompute_delays=False,
+    rng=random,
+    delay_bucket=4096,
+    topology="random",
+    links=None,
+    relay=None,
+    mempool_overlap=1.0,
+    finality=None,
+):
     """
-    Initializes the nodes for the simulation.
+    Initializes the nodes for the simulation. Neighbors are drawn from rng by the topology generator.
+
+    The topology is built as adjacency arrays and each node's neighbors are read from its slice when needed,
+    so building a network takes O(links) rather than O(nodes^2) and its links are stored once.
+
+    With a LinkModel, every link gets its own latency and bandwidth, drawn after the topology from a seed taken
+    from rng.
+
+    With a relay protocol, blocks are announced with its messages instead of being sent in full to every neighbor.
+
+    With a finality depth, every node keeps a BlockTree of the competing blocks it has seen, pruned below that depth.
+
+    With precompute_delays, blocks are charged from shortest-path delays computed once for the static topology
+    instead of being relayed through the gossip. Their paths are picked for block sizes rounded up to delay_bucket
+    bytes.
     """
     nodes = []
+    gossip = Gossip(env)
+    network = get_topology(topology, num_nodes, max_neighbors, rng=rng, latency=latency)
+    if links is not None:
+        links.apply(network, np.random.default_rng(rng.getrandbits(64)))
 
     # Create nodes
     for i in range(num_nodes):
@@ -17,25 +56,27 @@ def init_nodes(env, num_nodes, max_neighbors, latency, bandwidth):
                 num_neighbors=max_neighbors,
                 latency=latency,
                 bandwidth=bandwidth,
+                gossip=gossip,
             )
         )
 
-    # Assign neighbors to each node
+    # Point each node at its slice of the adjacency arrays
+    offsets = network.offsets.tolist()
     for node in nodes:
-        neighbors = min(
-            node.max_neighbors, num_nodes - 1
-        )  # Ensure we don't exceed available nodes
-
-        possible_neighbors = [x for x in range(0, num_nodes) if x != node.id]
-        neighbor_ids = random.sample(possible_neighbors, neighbors)
+        start, end = offsets[node.id], offsets[node.id + 1]
+        node.topology = network
+        node.first_link = start
+        node.degree = end - start
+        node.peers = nodes
+        node.relay = relay
+        node.mempool_overlap = mempool_overlap
+        if finality is not None:
+            node.tree = BlockTree(finality)
 
-        node.neighbors = [nodes[id] for id in neighbor_ids]
-
-    # Ensures each neighbor is added to the other node's neighbors
-    for node in nodes:
-        for neighbor in node.neighbors:
-            if node not in neighbor.neighbors:
-                neighbor.neighbors.append(node)
+    if precompute_delays:
+        delay_model = DelayModel(nodes, bucket=delay_bucket)
+        for node in nodes:
+            node.delay_model = delay_model
 
     return nodes
 
@@ -47,19 +88,23 @@ def init_wallets(num_wallets):
     return wallets
 
 
-def init_miners(env, num_miners, hashrate, nodes, wallets):
+def init_miners(
+    env, num_miners, hashrate, nodes, wallets, rng=random, mining_rng=random
+):
     """
     Initializes the miners for the simulation.
+
+    Wallets and nodes are assigned from rng, and the miners draw their mine times from mining_rng.
     """
     miners = []
 
-    miner_wallets = random.sample(
+    miner_wallets = rng.sample(
         wallets,
         num_miners,
     )
 
     for i in range(num_miners):
-        node = random.choice(nodes)
+        node = rng.choice(nodes)
         miners.append(
             Miner(
                 env,
@@ -67,6 +112,7 @@ def init_miners(env, num_miners, hashrate, nodes, wallets):
                 node=node,
                 hashrate=hashrate,
                 wallet=miner_wallets[i],
+                rng=mining_rng,
             )
         )
 
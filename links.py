@@ -0,0 +1,249 @@
+import json
+
+import numpy as np
+
+
+# The number of parameters of each distribution
+DISTRIBUTIONS = {
+    "constant": 1,
+    "uniform": 2,
+    "normal": 2,
+    "lognormal": 2,
+    "exponential": 1,
+    "pareto": 2,
+}
+
+
+def parse_distribution(spec):
+    """
+    Parses a distribution written as name:param,param, e.g. lognormal:0.1,0.5. A plain number is a constant.
+
+    The parameters are constant:value, uniform:low,high, normal:mean,std (clipped at 0), lognormal:median,sigma,
+    exponential:mean and pareto:minimum,shape.
+
+    Args:
+        spec (str or float): The distribution.
+
+    Raises:
+        ValueError: If the distribution is unknown or has the wrong number of parameters.
+
+    Returns:
+        tuple: The name of the distribution and its parameters.
+    """
+    if isinstance(spec, (int, float)):
+        return "constant", (float(spec),)
+
+    name, _, params = str(spec).partition(":")
+    name = name.strip().lower()
+
+    if name not in DISTRIBUTIONS:
+        try:
+            return "constant", (float(spec),)
+        except ValueError:
+            raise ValueError(
+                f"Unknown distribution: {spec}. Must be a number or one of {', '.join(DISTRIBUTIONS)}"
+            ) from None
+
+    params = tuple(float(param) for param in params.split(",")) if params else ()
+    if len(params) != DISTRIBUTIONS[name]:
+        raise ValueError(
+            f"Distribution {name} takes {DISTRIBUTIONS[name]} parameters, got {len(params)}"
+        )
+
+    return name, params
+
+
+def draw(distribution, generator, size):
+    """
+    Draws size values from a parsed distribution.
+    """
+    name, params = distribution
+
+    if name == "constant":
+        return np.full(size, params[0])
+    if name == "uniform":
+        return generator.uniform(params[0], params[1], size)
+    if name == "normal":
+        return np.maximum(generator.normal(params[0], params[1], size), 0)
+    if name == "lognormal":
+        return params[0] * np.exp(params[1] * generator.standard_normal(size))
+    if name == "exponential":
+        return generator.exponential(params[0], size)
+    return params[0] * (1 + generator.pareto(params[1], size))
+
+
+def get_reverse(topology):
+    """
+    Returns the position in the topology's arrays of the reverse of each link entry.
+    """
+    sources = topology.get_sources()
+    targets = topology.targets
+    keys = sources * topology.num_nodes + targets
+
+    order = np.argsort(keys)
+    return order[
+        np.searchsorted(keys, targets * topology.num_nodes + sources, sorter=order)
+    ]
+
+
+class LinkModel:
+    """
+    Per-link latencies and bandwidths for a topology.
+
+    A link's latency is a draw from the latency distribution, plus half the round trip time between the regions
+    of its nodes, plus the access latency of each node's peer class. Its bandwidth is the lowest of a draw from
+    the bandwidth distribution and the bandwidths of its nodes' classes. Links are symmetric, both directions
+    share one draw.
+
+    The values are stored as float32 arrays alongside the topology's adjacency, so millions of links take
+    8 bytes each, and are all drawn at once.
+
+    Attributes:
+        latency: The distribution of the per-link latency.
+        bandwidth: The distribution of the per-link bandwidth.
+        classes: The peer classes, each a dict with a share of the nodes and optional latency and bandwidth distributions.
+        regions: The share of nodes in each region and the round trip times between them, if any.
+    """
+
+    def __init__(self, latency, bandwidth, classes=(), regions=None):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.classes = list(classes)
+        self.regions = regions
+
+        if self.classes and sum(c["share"] for c in self.classes) <= 0:
+            raise ValueError("Peer class shares must add up to more than 0")
+
+        if regions is not None:
+            rtt = np.asarray(regions["rtt"], dtype=float)
+            if rtt.shape != (len(regions["shares"]), len(regions["shares"])):
+                raise ValueError(
+                    "Region RTT matrix must be square with one row per region share"
+                )
+
+    @classmethod
+    def from_config(
+        cls,
+        config=None,
+        latency=0,
+        bandwidth=float("inf"),
+        link_latency=None,
+        link_bandwidth=None,
+    ):
+        """
+        Builds a link model from a config and the command line.
+
+        The config is a dict (or the path of a JSON file) with optional keys latency and bandwidth (distributions),
+        classes (a list of {"name", "share", "latency", "bandwidth"}) and regions ({"shares": [...], "rtt": [[...]]}).
+        link_latency and link_bandwidth replace the config's distributions, and without either the links use
+        latency and bandwidth.
+
+        Args:
+            config (dict or str, optional): The config or the path of a JSON config. Defaults to None.
+            latency (float, optional): The latency of every link, unless a distribution is given. Defaults to 0.
+            bandwidth (float, optional): The bandwidth of every link, unless a distribution is given. Defaults to inf.
+            link_latency (str, optional): The latency distribution. Defaults to None.
+            link_bandwidth (str, optional): The bandwidth distribution. Defaults to None.
+
+        Returns:
+            LinkModel: The link model.
+        """
+        if isinstance(config, str):
+            with open(config) as file:
+                config = json.load(file)
+        config = dict(config or {})
+
+        if link_latency is not None:
+            config["latency"] = link_latency
+        if link_bandwidth is not None:
+            config["bandwidth"] = link_bandwidth
+
+        classes = []
+        for peer_class in config.get("classes", []):
+            classes.append(
+                {
+                    "name": peer_class.get("name"),
+                    "share": float(peer_class["share"]),
+                    "latency": (
+                        parse_distribution(peer_class["latency"])
+                        if "latency" in peer_class
+                        else None
+                    ),
+                    "bandwidth": (
+                        parse_distribution(peer_class["bandwidth"])
+                        if "bandwidth" in peer_class
+                        else None
+                    ),
+                }
+            )
+
+        return cls(
+            latency=parse_distribution(config.get("latency", latency)),
+            bandwidth=parse_distribution(config.get("bandwidth", bandwidth)),
+            classes=classes,
+            regions=config.get("regions"),
+        )
+
+    def apply(self, topology, generator):
+        """
+        Draws the latency and bandwidth of every link of a topology and stores them in it.
+
+        A topology that already has latencies, e.g. a geographic one, keeps them in place of the latency draw.
+
+        Args:
+            topology (Topology): The topology.
+            generator (numpy.random.Generator): The generator the values are drawn from.
+        """
+        num_nodes = topology.num_nodes
+        sources = topology.get_sources()
+        targets = topology.targets
+
+        # One draw per link, copied to its reverse
+        forward = sources < targets
+        backward = np.flatnonzero(~forward)
+        reverse = get_reverse(topology)[backward]
+
+        if topology.latencies is not None:
+            latencies = topology.latencies.astype(float)
+        else:
+            latencies = np.empty(len(targets))
+            latencies[forward] = draw(self.latency, generator, forward.sum())
+            latencies[backward] = latencies[reverse]
+
+        bandwidths = np.empty(len(targets))
+        bandwidths[forward] = draw(self.bandwidth, generator, forward.sum())
+        bandwidths[backward] = bandwidths[reverse]
+
+        if self.regions is not None:
+            shares = np.asarray(self.regions["shares"], dtype=float)
+            rtt = np.asarray(self.regions["rtt"], dtype=float)
+            rtt = (rtt + rtt.T) / 2
+
+            region = generator.choice(len(shares), num_nodes, p=shares / shares.sum())
+            latencies += rtt[region[sources], region[targets]] / 2
+
+        if self.classes:
+            shares = np.array([c["share"] for c in self.classes])
+            peer_class = generator.choice(
+                len(self.classes), num_nodes, p=shares / shares.sum()
+            )
+
+            access = np.zeros(num_nodes)
+            uplink = np.full(num_nodes, float("inf"))
+            for i, c in enumerate(self.classes):
+                members = np.flatnonzero(peer_class == i)
+                if c["latency"] is not None:
+                    access[members] = draw(c["latency"], generator, len(members))
+                if c["bandwidth"] is not None:
+                    uplink[members] = draw(c["bandwidth"], generator, len(members))
+
+            latencies += access[sources] + access[targets]
+            bandwidths = np.minimum(
+                bandwidths, np.minimum(uplink[sources], uplink[targets])
+            )
+
+        if np.any(bandwidths <= 0):
+            raise ValueError("Link bandwidths must be greater than 0")
+
+        topology.latencies = latencies.astype(np.float32)
+        topology.bandwidths = bandwidths.astype(np.float32)
@@ -1,32 +1,46 @@
 import simpy
-from core import Node, Block, Miner, BlockChain, Transaction, Wallet
+from core import (
+    Node,
+    Block,
+    Miner,
+    BlockChain,
+    Transaction,
+    Wallet,
+    BLOCK_BASE_SIZE,
+    TRANSACTION_SIZE,
+)
 import random
 import math
 from init_objs import init_nodes, init_wallets, init_miners
 from stats import Stats
-
-
-def get_winning_miner(miners, difficulty):
-    """
-    Returns the miner with the shortest mining time.
-    """
-
-    mine_times = []
-
-    for miner in miners:
-        miner.get_mine_time(math.ceil(difficulty))
-        mine_times.append(miner.mine_time)
-
-    return miners[mine_times.index(min(mine_times))]
-
-
-def mine_block(miners, difficulty):
+from selection import WinnerSelector
+from fast_forward import fast_forward_mining
+from streams import RandomStreams
+from workload import Workload, get_arrivals
+from replay import TraceWorkload
+from metrics import MetricsSink
+from checkpoint import (
+    Checkpointer,
+    load_checkpoint,
+    restore_checkpoint,
+    restore_stats,
+)
+from profiler import Profiler
+from links import LinkModel, parse_distribution
+from relay import get_relay
+from blocktree import BlockTree
+from txsize import TransactionSizes
+
+
+def mine_block(selector, difficulty):
     """
     Mines a block and alerts the winning miner.
+
+    The winner is drawn from the total hashrate in one step rather than by drawing a mine time for every miner.
     """
 
     # Get the winning miner
-    winning_miner = get_winning_miner(miners, difficulty)
+    winning_miner = selector.select(math.ceil(difficulty))
 
     # Wait for the winning miner to mine the block
 
@@ -35,115 +49,83 @@ def mine_block(miners, difficulty):
     return winning_miner
 
 
-def make_random_transaction(
-    env, sender, receivers, miners, interval, num_transactions, amount=None
-):
+def record_block(stats, metrics, block_time, network_time, row=None):
     """
-    Creates a transaction between a sender and a receiver.
-    This is based on the receiver with the least balance strictly for the purpose of the simulation.
-
-    If the sender has a minimum balance, the transaction will be made to a random receiver.
+    Adds a block's total time, the time since the last block plus its network time, and writes its metrics row.
 
     Args:
-        env (simpy.Environment): The environment.
-        blockchain (BlockChain): The blockchain.
-        sender (Wallet): The sender of the transaction.
-        receivers (list): The receivers of the transaction.
-        amount (float): The amount of the transaction.
+        stats (Stats): The stats.
+        metrics (MetricsSink): The sink the row is written to, or None.
+        block_time (float): The time since the last block.
+        network_time (float): The broadcast time the block added across every node.
+        row (dict, optional): The block's metrics row, with its network and total times to fill in. Defaults to None.
     """
+    total_time = network_time + block_time
+    stats.add_total_time(total_time)
 
-    receiver = min(receivers, key=lambda x: x.balance)
-
-    # Ensures the sender has a balance > 0
-
-    while sender == receiver:
+    if metrics is not None:
+        row["network_time"] = network_time
+        row["total_time"] = total_time
+        metrics.write_block(row)
 
-        receiver = min(receivers, key=lambda x: x.balance)
-        if receiver == sender:
-            receiver = random.choice(receivers)
 
-    if amount is None:
-
-        if sender in miners:
-            #! This is a hack to ensure that miners have a balance > 0
-            # This is only for the purpose of the simulation and should be removed
-
-            # It was found many wallets had a balance near 0 as the miners transactions went through quicker than they could be added to the blockchain
-            # This lead to a weak economy as the miners could not spend their own coins and the other wallets had no coins (or nearly no coins)
-            amount = sender.balance
-
-        else:
-            # This is a hack to ensure that the transaction is not too large
-            # Allows for many transactions to be made without the wallets having to be near 0
-            amount = random.uniform(sender.balance * 0.05, sender.balance * 0.1)
-
-        if amount <= 0:
-            print(sender.balance)
-            raise ValueError("Amount is less than 0. This should not happen.")
-
-        if amount > sender.balance:
-            print(amount)
-            print(sender.balance)
-            raise ValueError("Sender does not have enough balance")
+def spread_block(miner, block, stats, metrics, block_time, row=None):
+    """
+    Spreads a block mined while earlier blocks may still be spreading, and records it once it has reached every node.
 
-    transaction = Transaction(env, amount=amount, receiver=receiver, sender=sender)
-    return transaction
+    The block's network time is only complete then, and is its own rather than mixed with the blocks spreading
+    alongside it.
+    """
+    yield from miner.win_block(block)
+    record_block(stats, metrics, block_time, block.network_time, row)
 
 
-def add_transactions(
-    env,
-    wallets,
-    num_transactions,
-    interval,
-    blockchain,
-    miners,
-    end=False,
+def attach_profiler(
+    profiler, env, blockchain, nodes, workload, metrics=None, checkpointer=None
 ):
     """
-    Adds transactions to the block.
-    """
-
-    tx_count = 0
+    Wraps the hot paths of a simulation in the profiler's phases. The mining loop wraps its own selector and Stats.
 
-    while tx_count < (num_transactions * len(wallets)) and not blockchain.stop_process:
-
-        # for every wallet with a balance, makes a random transaction to a random receiver
-        # if the wallet has not made num_transactions transactions out
-
-        for i in range(len(wallets)):
-
-            # Checks if the wallet has a balance and has not made num_transactions transactions out
-            # Rounds the balance to 15 decimal places to avoid floating point errors
+    Args:
+        profiler (Profiler): The profiler.
+        env (simpy.Environment): The environment, whose events are counted.
+        blockchain (BlockChain): The blockchain.
+        nodes (list): The nodes.
+        workload (Workload): The transaction workload.
+        metrics (MetricsSink, optional): The metrics sink. Defaults to None.
+        checkpointer (Checkpointer, optional): The checkpointer. Defaults to None.
+    """
+    profiler.count_events(env)
+    profiler.wrap(blockchain, ("finalize_block", "create_block"), "finalize")
+    profiler.wrap(workload, "add_batch", "transactions")
 
-            if (
-                round(wallets[i].balance, 15) > 0
-                and wallets[i].tx_out < num_transactions
-            ):
-                transaction = make_random_transaction(
-                    env,
-                    wallets[i],
-                    receivers=wallets,
-                    miners=miners,
-                    interval=interval,
-                    num_transactions=num_transactions,
-                )
+    for node in nodes:
+        profiler.wrap(
+            node, ("add_block", "broadcast_update", "receive_block"), "propagation"
+        )
 
-                blockchain.add_transaction(transaction)
-                tx_count += 1
+    # The gossip and delay model are shared by every node
+    if nodes[0].gossip is not None:
+        profiler.wrap(nodes[0].gossip, ("start", "deliver", "wait"), "propagation")
+    if nodes[0].delay_model is not None:
+        profiler.wrap(nodes[0].delay_model, "charge", "propagation")
 
-            # Checks for negative balance
-            if wallets[i].balance < 0:
-                print(f"Wallet {i} has {wallets[i].balance} balance")
-                raise ValueError("Wallet has negative balance")
+    if metrics is not None:
+        profiler.wrap(metrics, ("write_block", "write_interval"), "metrics")
+    if checkpointer is not None:
+        profiler.wrap(checkpointer, "save", "checkpoint")
 
-            # Checks for duplicate transactions
-            if wallets[i].tx_out > num_transactions:
-                raise ValueError("Wallet has too many transactions")
 
-        yield env.timeout(interval)
+def report_profile(profiler, profile_out=None):
+    """
+    Stops the profiler, prints its summary and writes its files if profile_out is given.
+    """
+    profiler.stop()
+    print(profiler.get_summary_str())
 
-    if end:
-        blockchain.stop_process = True
+    if profile_out is not None:
+        profiler.dump(profile_out)
+        print(f"Profile written to {profile_out}.folded")
 
 
 def begin_mining(
@@ -159,6 +141,12 @@ def begin_mining(
     diff_interval=2016,
     difficulty=None,
     blocks=None,
+    rng=random,
+    metrics=None,
+    checkpointer=None,
+    resume_state=None,
+    profiler=None,
+    tree=None,
 ):
     """This is the main mining process. It begins mining blocks  in a loop and updates the blockchain.
 
@@ -175,11 +163,20 @@ def begin_mining(
         diff_interval (int, optional): The difficulty interval. Defaults to 2016.
         difficulty (int, optional): The difficulty. Defaults to None.
         blocks (int, optional): The number of blocks. Defaults to None.
+        rng (random.Random, optional): The random number stream for block times and winners. Defaults to the random module.
+        metrics (MetricsSink, optional): The sink per-block and per-interval records are written to. Defaults to None.
+        checkpointer (Checkpointer, optional): Saves the simulation every checkpoint interval blocks. Defaults to None.
+        resume_state (dict, optional): The checkpoint the run resumes from, whose Stats are restored. Defaults to None.
+        profiler (Profiler, optional): Times the winner selection and Stats updates and counts events per block. Defaults to None.
+        tree (BlockTree, optional): The tree of every mined block. With it, miners mine on their node's tip and the next
+            block is mined while the last one spreads, so blocks can compete. Defaults to None.
 
     Raises:
         ValueError: If the difficulty is not provided and the blocktime, hashrate, and number of miners are not provided.
         ValueError: If the blocks, years, or num_transactions are not provided.
 
+    Returns:
+        Stats: The stats of the run, once the process has finished.
     """
 
     if difficulty is None:
@@ -200,34 +197,80 @@ def begin_mining(
         blockchain=blockchain,
         blocks=blocks,
         difficulty=difficulty,
+        metrics=metrics,
+        tree=tree,
     )
 
+    if resume_state is not None:
+        restore_stats(stats, resume_state)
+
+    selector = WinnerSelector(miners, rng=rng)
+
+    if profiler is not None:
+        profiler.wrap(selector, "select", "selection")
+        profiler.wrap(
+            stats,
+            ("add_block_time", "add_total_time", "update_difficulty", "get_stats_str"),
+            "stats",
+        )
+
     # Main mining Loop
     while True:
 
-        winning_miner = mine_block(miners, stats.difficulty)
+        winning_miner = mine_block(selector, stats.difficulty)
 
         yield env.timeout(winning_miner.mine_time)
 
         blockchain.finalize_block()
+        block = blockchain.get_current_block()
 
         # Alert the node
         # This sends the block to the node which is added to the ledger
         # As well this node communicates with its neighbors and updates them.
-        yield env.process(winning_miner.win_block(blockchain.get_current_block()))
+        if tree is None:
+            yield env.process(winning_miner.win_block(block))
+        else:
+            # The block extends the best block the miner's node has seen, which blocks still in flight may beat
+            block.parent_id = winning_miner.node.tree.tip
+            block.work = stats.difficulty
+            tree.add(block.block_id, block.parent_id, block.work)
 
-        stats.add_block_time(blockchain.get_current_block().time_since_last_block)
+        stats.add_block_time(block.time_since_last_block)
 
         blockchain.create_block(env, winning_miner)
+        block_time = blockchain.get_current_block().time_since_last_block
+
+        # The network and total times are filled in once the block has spread
+        row = None
+        if metrics is not None:
+            row = {
+                "block": block.block_id,
+                "time": env.now,
+                "block_time": block_time,
+                "total_time": None,
+                "transactions": block.transaction_count,
+                "fees": block.fees,
+                "size": block.size,
+                "network_time": None,
+                "difficulty": stats.difficulty,
+                "miner": winning_miner.id,
+                "events": profiler.block_events if profiler is not None else None,
+            }
 
         # This adds the total time from the latency and bandwidth of the nodes
-        stats.add_total_time(
-            sum(node.broadcast_times[-1] for node in nodes)
-            + blockchain.get_current_block().time_since_last_block
-        )
+        if tree is None:
+            record_block(stats, metrics, block_time, block.network_time, row)
+        else:
+            # Mining carries on while the block spreads, so its total time is added once it has reached every node
+            env.process(
+                spread_block(winning_miner, block, stats, metrics, block_time, row)
+            )
+
+        if profiler is not None:
+            profiler.end_block()
 
         # Adjusts difficulty every 2016 blocks
-        if len(stats.block_times) % diff_interval == 0:
+        if stats.block_times.count % diff_interval == 0:
             stats.update_difficulty()
 
         if blockchain.total_blocks == stats.total_blocks:
@@ -251,17 +294,37 @@ def begin_mining(
             else:
                 print(stats.get_stats_str())
 
-    if nodes[0].latency > 0 or nodes[0].bandwidth < float("inf"):
-        print(
-            f"Avg Broadcast Time per block: {sum(sum(node.broadcast_times) for node in nodes) / len(nodes) / blockchain.total_blocks}"
-        )
+        # Saved between blocks, once the block has been counted and printed
+        if (
+            checkpointer is not None
+            and blockchain.total_blocks % checkpointer.interval == 0
+        ):
+            checkpointer.save(stats)
+
+    # Per-link latencies and bandwidths can delay blocks even when the nodes' own are 0 and infinite
+    broadcast_time = sum(node.broadcast_times.sum() for node in nodes)
+    if broadcast_time > 0:
         print(
-            f"Total Broadcast Time: {sum(sum(node.broadcast_times) for node in nodes)}"
+            f"Avg Broadcast Time per block: {broadcast_time / len(nodes) / blockchain.total_blocks}"
         )
+        print(f"Total Broadcast Time: {broadcast_time}")
 
-    if blockchain.fee > 0:
+    if stats.latencies.count > 0:
+        print(stats.get_latency_str())
+
+    if blockchain.fee > 0 or blockchain.fee_market:
         print(f"Total Fees: {blockchain.total_fees}")
 
+    if blockchain.fee_tiers is not None:
+        print(blockchain.fee_tiers.get_summary_str())
+        if blockchain.tx_pool.max_bytes is not None:
+            print(f"Pool evictions: {blockchain.tx_pool.evicted}")
+
+    if nodes[0].relay is not None:
+        print(nodes[0].relay.get_summary_str(nodes))
+
+    return stats
+
 
 def main(
     num_miners,
@@ -282,6 +345,33 @@ def main(
     latency=0,
     bandwidth=float("inf"),
     fee=0,
+    fee_priority=False,
+    fast_forward=False,
+    precompute_delays=False,
+    delay_bucket=4096,
+    seed=None,
+    arrivals="fixed",
+    metrics_out=None,
+    checkpoint=None,
+    checkpoint_every=100000,
+    resume=None,
+    profile=False,
+    profile_out=None,
+    topology="random",
+    link_latency=None,
+    link_bandwidth=None,
+    link_config=None,
+    relay="full",
+    mempool_overlap=0.99,
+    forks=False,
+    finality=100,
+    fee_rates=None,
+    pool_bytes=None,
+    tx_sizes=None,
+    block_bytes=None,
+    trace=None,
+    trace_scale=1.0,
+    trace_chunk=100000,
 ):
     if num_neighbors >= num_nodes:
         raise ValueError("Neighbors cannot be greater than or equal to nodes")
@@ -294,25 +384,240 @@ def main(
     if fee < 0:
         raise ValueError("Fee must be greater than 0")
 
-    env = simpy.Environment()
-    blockchain = BlockChain(env, blocksize, reward, halving, fee)
-    nodes = init_nodes(env, num_nodes, num_neighbors, latency, bandwidth)
+    # Wallets bid their own fee rates, which replace the flat fee
+    if fee_rates is not None:
+        if fee > 0 or fee_priority:
+            raise ValueError("Fee rates cannot be combined with a flat fee or fee priority")
+        fee_rates = parse_distribution(fee_rates)
+
+    if pool_bytes is not None and fee_rates is None and trace is None:
+        raise ValueError("A pool byte cap needs fee rates to evict by")
+
+    # Blocks always have room for their header and reward, and no transaction is drawn too big for any block
+    sizes = None
+    if block_bytes is not None and block_bytes < BLOCK_BASE_SIZE + TRANSACTION_SIZE:
+        raise ValueError(
+            f"Block bytes must be at least {BLOCK_BASE_SIZE + TRANSACTION_SIZE}, the block header and reward"
+        )
+    if tx_sizes is not None:
+        sizes = TransactionSizes(
+            tx_sizes,
+            maximum=(
+                block_bytes - BLOCK_BASE_SIZE - TRANSACTION_SIZE
+                if block_bytes is not None
+                else None
+            ),
+        )
+
+    if fee_rates is not None and (checkpoint is not None or resume is not None):
+        raise ValueError("Runs with fee rates cannot be checkpointed or resumed")
+
+    # A trace brings its own senders, amounts, sizes and fees in place of the generated workload
+    if trace is not None:
+        if num_transactions != 0 or fast_forward:
+            raise ValueError(
+                "Traces replace the generated transactions and cannot be fast forwarded"
+            )
+        if fee > 0 or fee_priority or fee_rates is not None or tx_sizes is not None:
+            raise ValueError(
+                "Traces bring their own fees and sizes, so cannot be combined with fee, fee priority, fee rates or transaction sizes"
+            )
+        if checkpoint is not None or resume is not None:
+            raise ValueError("Trace runs cannot be checkpointed or resumed")
+
+    # Heterogeneous links, only built when asked for so the nodes' latency and bandwidth apply otherwise
+    links = None
+    if (
+        link_latency is not None
+        or link_bandwidth is not None
+        or link_config is not None
+    ):
+        links = LinkModel.from_config(
+            link_config,
+            latency=latency,
+            bandwidth=bandwidth,
+            link_latency=link_latency,
+            link_bandwidth=link_bandwidth,
+        )
+
+    if fast_forward and (
+        num_transactions != 0
+        or latency != 0
+        or bandwidth != float("inf")
+        or links is not None
+    ):
+        raise ValueError(
+            "Fast forward requires no transactions, no latency and infinite bandwidth"
+        )
+
+    if not 0 <= mempool_overlap <= 1:
+        raise ValueError("Mempool overlap must be between 0 and 1")
+
+    if delay_bucket < 1:
+        raise ValueError("Delay bucket must be at least 1 byte")
+
+    if relay != "full" and (fast_forward or precompute_delays):
+        raise ValueError(
+            "Fast forward and precomputed delays only model full block relay"
+        )
+
+    if forks and (fast_forward or precompute_delays):
+        raise ValueError(
+            "Forks need blocks relayed through the gossip, not fast forward or precomputed delays"
+        )
+
+    if forks and (checkpoint is not None or resume is not None):
+        raise ValueError("Runs with forks cannot be checkpointed or resumed")
+
+    if fast_forward and (checkpoint is not None or resume is not None):
+        raise ValueError("Fast forward runs cannot be checkpointed or resumed")
+
+    resume_state = load_checkpoint(resume) if resume is not None else None
+
+    # A resumed run draws the same network as the checkpointed one, so its streams come from the checkpoint's seed
+    if resume_state is not None:
+        if seed is not None and seed != resume_state["streams"]["seed"]:
+            raise ValueError(
+                f"Seed {seed} does not match the checkpoint's seed {resume_state['streams']['seed']}"
+            )
+        seed = resume_state["streams"]["seed"]
+
+    # Separate streams so changing one part of the run does not change the random numbers of another
+    streams = RandomStreams(seed)
+
+    # A resumed run's clock starts where the checkpoint left off
+    env = simpy.Environment(
+        initial_time=resume_state["now"] if resume_state is not None else 0
+    )
+    metrics = MetricsSink(metrics_out) if metrics_out is not None else None
+    blockchain = BlockChain(
+        env,
+        blocksize,
+        reward,
+        halving,
+        fee,
+        fee_priority,
+        fee_market=fee_rates is not None or trace is not None,
+        pool_bytes=pool_bytes,
+        block_bytes=block_bytes,
+    )
+    nodes = init_nodes(
+        env,
+        num_nodes,
+        num_neighbors,
+        latency,
+        bandwidth,
+        precompute_delays,
+        rng=streams.topology,
+        delay_bucket=delay_bucket,
+        topology=topology,
+        links=links,
+        relay=get_relay(relay, streams.relay),
+        mempool_overlap=mempool_overlap,
+        finality=finality if forks else None,
+    )
     wallets = init_wallets(num_wallets)
-    miners = init_miners(env, num_miners, hashrate, nodes, wallets)
+    miners = init_miners(
+        env,
+        num_miners,
+        hashrate,
+        nodes,
+        wallets,
+        rng=streams.topology,
+        mining_rng=streams.mining,
+    )
+
+    # Only built when asked for, so an unprofiled run calls the original methods
+    profiler = None
+    if profile or profile_out is not None:
+        profiler = Profiler(cprofile=profile_out is not None)
+
+    # Skips the SimPy processes entirely when nothing happens between blocks
+    if fast_forward:
+        mine = fast_forward_mining
+        if profiler is not None:
+            mine = profiler.timed("fast_forward", mine)
+            profiler.start()
+
+        stats = mine(
+            env,
+            miners=miners,
+            blockchain=blockchain,
+            blocktime=blocktime,
+            hashrate=hashrate,
+            print_interval=print_interval,
+            nodes=nodes,
+            blocks=blocks,
+            years=years,
+            difficulty=difficulty,
+            rng=streams.mining_batch,
+            metrics=metrics,
+        )
+
+        if metrics is not None:
+            metrics.close()
+        if profiler is not None:
+            report_profile(profiler, profile_out)
+        return stats
 
-    env.process(
-        add_transactions(
+    if trace is not None:
+        workload = TraceWorkload(
             env,
             wallets,
-            num_transactions,
-            interval,
             blockchain,
+            trace,
+            time_scale=trace_scale,
+            chunk_rows=trace_chunk,
+            end=blocks is None,
+            max_size=(
+                block_bytes - BLOCK_BASE_SIZE - TRANSACTION_SIZE
+                if block_bytes is not None
+                else None
+            ),
+        )
+    else:
+        workload = Workload(
+            env,
+            wallets,
             miners=miners,
+            blockchain=blockchain,
+            num_transactions=num_transactions,
+            arrivals=get_arrivals(arrivals, interval),
+            generator=streams.transactions.generator,
             end=(num_transactions != 0 and blocks is None),
+            fee_rates=fee_rates,
+            fee_generator=streams.fees,
+            sizes=sizes,
+            size_generator=streams.sizes,
+        )
+
+    if resume_state is not None:
+        restore_checkpoint(
+            resume_state, env, blockchain, wallets, miners, nodes, streams, workload
+        )
+
+    checkpointer = None
+    if checkpoint is not None:
+        checkpointer = Checkpointer(
+            checkpoint,
+            checkpoint_every,
+            env,
+            blockchain,
+            wallets,
+            miners,
+            nodes,
+            streams,
+            workload,
         )
-    )
 
-    env.process(
+    if profiler is not None:
+        attach_profiler(
+            profiler, env, blockchain, nodes, workload, metrics, checkpointer
+        )
+
+    env.process(workload.run(delay=workload.next_tick - env.now))
+
+    mining = env.process(
         begin_mining(
             env,
             miners=miners,
@@ -325,11 +630,30 @@ def main(
             blocks=blocks,
             years=years,
             difficulty=difficulty,
+            rng=streams.mining,
+            metrics=metrics,
+            checkpointer=checkpointer,
+            resume_state=resume_state,
+            profiler=profiler,
+            tree=BlockTree(finality) if forks else None,
         )
     )
 
+    if profiler is not None:
+        profiler.start()
+
     env.run()
 
+    if trace is not None and workload.skipped:
+        print(f"Trace rows skipped as self-sends or moving nothing: {workload.skipped}")
+
+    if metrics is not None:
+        metrics.close()
+    if profiler is not None:
+        report_profile(profiler, profile_out)
+
+    return mining.value
+
 
 if __name__ == "__main__":
     main(
@@ -351,4 +675,31 @@ if __name__ == "__main__":
         latency=0,
         bandwidth=float("inf"),
         fee=0,
+        fee_priority=False,
+        fast_forward=False,
+        precompute_delays=False,
+        delay_bucket=4096,
+        seed=None,
+        arrivals="fixed",
+        metrics_out=None,
+        checkpoint=None,
+        checkpoint_every=100000,
+        resume=None,
+        profile=False,
+        profile_out=None,
+        topology="random",
+        link_latency=None,
+        link_bandwidth=None,
+        link_config=None,
+        relay="full",
+        mempool_overlap=0.99,
+        forks=False,
+        finality=100,
+        fee_rates=None,
+        pool_bytes=None,
+        tx_sizes=None,
+        block_bytes=None,
+        trace=None,
+        trace_scale=1.0,
+        trace_chunk=100000,
     )
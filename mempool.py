@@ -0,0 +1,387 @@
+import heapq
+import itertools
+from collections import deque
+
+import numpy as np
+
+
+def pop_fitting(pool, count, max_bytes=None):
+    """
+    Pops transactions from a pool one at a time until count are taken or the next one would take more than max_bytes.
+    """
+    taken = []
+    while len(taken) < count and pool:
+        if max_bytes is not None:
+            size = pool.peek().size
+            if size > max_bytes:
+                break
+            max_bytes -= size
+
+        taken.append(pool.pop())
+
+    return taken
+
+
+class Mempool:
+    """
+    The pool of transactions waiting to be added to a block.
+
+    By default this is a FIFO queue backed by a deque, so popping the oldest transaction and pushing a reward
+    transaction to the front are both O(1). With fee priority on, waiting transactions are kept in a heap and
+    the one with the highest fee is popped first (ties are popped in arrival order).
+
+    Transactions pushed to the front (e.g. block rewards) are always popped before any waiting transaction.
+
+    Attributes:
+        front: Transactions that must be popped before the rest of the pool.
+        queue: The waiting transactions. A deque in FIFO mode or a heap in fee priority mode.
+        key: The function giving a transaction's fee priority. None for FIFO mode.
+        counter: Arrival counter used to break ties in the heap.
+    """
+
+    def __init__(self, key=None):
+        self.front = deque()
+        self.key = key
+        self.counter = itertools.count()
+
+        if key is None:
+            self.queue = deque()
+        else:
+            self.queue = []
+
+    def append(self, transaction):
+        """
+        Adds a transaction to the pool.
+
+        Args:
+            transaction (Transaction): The transaction to add.
+        """
+        if self.key is None:
+            self.queue.append(transaction)
+        else:
+            heapq.heappush(
+                self.queue, (-self.key(transaction), next(self.counter), transaction)
+            )
+
+    def extend(self, transactions):
+        """
+        Adds a batch of transactions to the pool in arrival order.
+
+        Args:
+            transactions (list): The transactions to add.
+        """
+        if self.key is None:
+            self.queue.extend(transactions)
+            return
+
+        entries = [
+            (-self.key(transaction), next(self.counter), transaction)
+            for transaction in transactions
+        ]
+
+        # Re-heapifying is cheaper than pushing one by one once the batch is a sizeable part of the pool
+        if len(entries) * 8 > len(self.queue):
+            self.queue.extend(entries)
+            heapq.heapify(self.queue)
+        else:
+            for entry in entries:
+                heapq.heappush(self.queue, entry)
+
+    def push_front(self, transaction):
+        """
+        Adds a transaction that is popped before every other transaction in the pool.
+
+        Args:
+            transaction (Transaction): The transaction to add.
+        """
+        self.front.appendleft(transaction)
+
+    def pop(self):
+        """
+        Removes and returns the next transaction to be added to a block.
+
+        Returns:
+            Transaction: The next transaction.
+        """
+        if self.front:
+            return self.front.popleft()
+
+        if self.key is None:
+            return self.queue.popleft()
+
+        return heapq.heappop(self.queue)[2]
+
+    def pop_many(self, count=None, max_bytes=None):
+        """
+        Removes and returns the next transactions, up to count of them and max_bytes of them in total.
+
+        Stops at the first transaction that does not fit, so blocks keep the pool's order. In FIFO mode the head
+        is read in doubling chunks until its sizes pass max_bytes, and the number that fit is found from their
+        prefix sums in one NumPy call, so a block costs O(transactions taken) rather than O(pool).
+
+        Args:
+            count (int, optional): The most transactions to take. Defaults to no limit.
+            max_bytes (int, optional): The most bytes to take. Defaults to no limit.
+
+        Returns:
+            list: The transactions, in the order they would have been popped.
+        """
+        if count is None:
+            count = len(self)
+
+        if self.key is not None:
+            return pop_fitting(self, count, max_bytes)
+
+        waiting = itertools.chain(self.front, self.queue)
+        if max_bytes is None:
+            head = list(itertools.islice(waiting, count))
+        else:
+            head = []
+            total = 0
+            chunk = 256
+            while len(head) < count and total <= max_bytes:
+                part = list(itertools.islice(waiting, min(chunk, count - len(head))))
+                if not part:
+                    break
+                head.extend(part)
+                total += sum(transaction.size for transaction in part)
+                chunk *= 2
+
+            sizes = np.fromiter(
+                (transaction.size for transaction in head),
+                dtype=np.int64,
+                count=len(head),
+            )
+            head = head[: int(np.searchsorted(np.cumsum(sizes), max_bytes, "right"))]
+
+        from_front = min(len(self.front), len(head))
+        for _ in range(from_front):
+            self.front.popleft()
+        for _ in range(len(head) - from_front):
+            self.queue.popleft()
+
+        return head
+
+    def peek(self):
+        """
+        Returns the next transaction without removing it.
+        """
+        if self.front:
+            return self.front[0]
+
+        if self.key is None:
+            return self.queue[0]
+
+        return self.queue[0][2]
+
+    def __len__(self):
+        return len(self.front) + len(self.queue)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        yield from self.front
+
+        if self.key is None:
+            yield from self.queue
+        else:
+            for entry in self.queue:
+                yield entry[2]
+
+    def __repr__(self):
+        return f"Mempool(size={len(self)}, priority={self.key is not None})"
+
+
+class FeeMempool:
+    """
+    The pool of waiting transactions ordered by fee rate (fee per byte), for building fee-maximizing blocks.
+
+    Waiting transactions are kept in a heap with the highest fee rate on top (ties in arrival order), so adding a
+    transaction is O(log n) and filling a block with k transactions pops k entries, O(k log n) however large
+    the pool is.
+
+    With max_bytes set, a second heap keeps the lowest fee rate on top, and whenever the pool grows past
+    max_bytes its lowest fee rate transactions (the newest first among ties) are evicted and their amounts
+    refunded to their senders. Each entry is in both heaps and removed lazily: an entry taken from one heap is
+    marked dead and skipped when it reaches the top of the other. A heap is rebuilt from its live entries once
+    most of it is dead, so dead entries never outnumber live ones for long.
+
+    Transactions pushed to the front (e.g. block rewards) are always popped before any waiting transaction
+    and never evicted.
+
+    Attributes:
+        front: Transactions that must be popped before the rest of the pool.
+        best: The heap of (-fee rate, arrival, entry) tuples, highest fee rate first.
+        worst: The heap of (fee rate, -arrival, entry) tuples, lowest fee rate first. Only kept with max_bytes.
+        max_bytes: The largest total size of the waiting transactions, or None for no limit.
+        bytes: The total size of the waiting transactions.
+        live: The number of waiting transactions.
+        evicted: The number of transactions evicted.
+        counter: Arrival counter used to break ties in the heaps.
+    """
+
+    def __init__(self, max_bytes=None):
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError("Pool byte cap must be greater than 0")
+
+        self.front = deque()
+        self.best = []
+        self.worst = []
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.live = 0
+        self.evicted = 0
+        self.counter = itertools.count()
+
+    def get_entry(self, transaction):
+        # Entries are [transaction, alive] so both heaps see an eviction or pop
+        arrival = next(self.counter)
+        entry = [transaction, True]
+
+        self.bytes += transaction.size
+        self.live += 1
+
+        return (-transaction.fee_rate, arrival, entry), (
+            transaction.fee_rate,
+            -arrival,
+            entry,
+        )
+
+    def append(self, transaction):
+        """
+        Adds a transaction to the pool, then evicts the lowest fee rate transactions if it is over its byte cap.
+
+        Args:
+            transaction (Transaction): The transaction to add.
+        """
+        best, worst = self.get_entry(transaction)
+        heapq.heappush(self.best, best)
+        if self.max_bytes is not None:
+            heapq.heappush(self.worst, worst)
+
+        self.evict()
+
+    def extend(self, transactions):
+        """
+        Adds a batch of transactions to the pool in arrival order, then evicts once for the whole batch.
+
+        Args:
+            transactions (list): The transactions to add.
+        """
+        entries = [self.get_entry(transaction) for transaction in transactions]
+
+        heaps = [(self.best, [best for best, _ in entries])]
+        if self.max_bytes is not None:
+            heaps.append((self.worst, [worst for _, worst in entries]))
+
+        # Re-heapifying is cheaper than pushing one by one once the batch is a sizeable part of the pool
+        for heap, new in heaps:
+            if len(new) * 8 > len(heap):
+                heap.extend(new)
+                heapq.heapify(heap)
+            else:
+                for item in new:
+                    heapq.heappush(heap, item)
+
+        self.evict()
+
+    def push_front(self, transaction):
+        """
+        Adds a transaction that is popped before every other transaction in the pool.
+
+        Args:
+            transaction (Transaction): The transaction to add.
+        """
+        self.front.appendleft(transaction)
+
+    def remove_top(self, heap):
+        """
+        Removes and returns the top live transaction of one of the heaps.
+        """
+        while True:
+            entry = heapq.heappop(heap)[2]
+            if entry[1]:
+                break
+
+        entry[1] = False
+        transaction = entry[0]
+        self.bytes -= transaction.size
+        self.live -= 1
+
+        self.compact()
+        return transaction
+
+    def pop(self):
+        """
+        Removes and returns the waiting transaction with the highest fee rate.
+
+        Returns:
+            Transaction: The next transaction.
+        """
+        if self.front:
+            return self.front.popleft()
+
+        return self.remove_top(self.best)
+
+    def pop_many(self, count=None, max_bytes=None):
+        """
+        Removes and returns the highest fee rate transactions, up to count of them and max_bytes of them in total.
+
+        Stops at the first transaction that does not fit, so taking k transactions costs O(k log n).
+        """
+        return pop_fitting(self, len(self) if count is None else count, max_bytes)
+
+    def peek(self):
+        """
+        Returns the next transaction without removing it.
+        """
+        if self.front:
+            return self.front[0]
+
+        while not self.best[0][2][1]:
+            heapq.heappop(self.best)
+        return self.best[0][2][0]
+
+    def evict(self):
+        """
+        Evicts the lowest fee rate transactions until the pool is within its byte cap.
+
+        Returns:
+            int: The number of transactions evicted.
+        """
+        if self.max_bytes is None:
+            return 0
+
+        count = 0
+        while self.bytes > self.max_bytes and self.live:
+            self.remove_top(self.worst).refund_balance()
+            count += 1
+
+        self.evicted += count
+        return count
+
+    def compact(self):
+        """
+        Rebuilds any heap that is mostly dead entries from its live ones.
+        """
+        for heap in (self.best, self.worst):
+            if len(heap) > 2 * self.live + 64:
+                heap[:] = [item for item in heap if item[2][1]]
+                heapq.heapify(heap)
+
+    def __len__(self):
+        return len(self.front) + self.live
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        yield from self.front
+
+        for item in self.best:
+            if item[2][1]:
+                yield item[2][0]
+
+    def __repr__(self):
+        return f"FeeMempool(size={len(self)}, bytes={self.bytes}, evicted={self.evicted})"
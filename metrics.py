@@ -0,0 +1,204 @@
+import csv
+import importlib.util
+import json
+import os
+
+
+FORMATS = ("csv", "jsonl", "parquet")
+
+# The columns of the per-block records
+BLOCK_COLUMNS = [
+    "block",
+    "time",
+    "block_time",
+    "total_time",
+    "transactions",
+    "fees",
+    "size",
+    "network_time",
+    "difficulty",
+    "miner",
+    "events",
+]
+
+# The columns of the per-interval records, Stats.print_dict plus the time it was taken
+INTERVAL_COLUMNS = [
+    "time",
+    "block_num",
+    "block_percent",
+    "abt",
+    "tps",
+    "tx_num",
+    "difficulty",
+    "coins",
+    "inflation",
+    "eta",
+    "hashrate",
+    "pool",
+    "io_requests",
+    "nmb",
+    "fees",
+    "network_time",
+    "stale_rate",
+    "reorgs",
+    "max_reorg_depth",
+    "latency_p50",
+    "latency_p90",
+    "latency_p99",
+    "latency_p999",
+]
+
+
+class MetricsStream:
+    """
+    One table of records written to a file in buffered batches.
+
+    Records are buffered column by column and written once batch_size of them are waiting,
+    so the history of a run never has to be held in memory.
+
+    Attributes:
+        path: The file written to.
+        format: The file format. One of csv, jsonl or parquet.
+        columns: The column names.
+        batch_size: The number of records buffered before they are written.
+        buffer: The buffered values of each column.
+        size: The number of buffered records.
+        file: The open file for csv and jsonl.
+        writer: The csv writer, or the ParquetWriter for parquet.
+    """
+
+    def __init__(self, path, format, columns, batch_size=10000):
+        self.path = path
+        self.format = format
+        self.columns = columns
+        self.batch_size = batch_size
+        self.buffer = {column: [] for column in columns}
+        self.size = 0
+        self.file = None
+        self.writer = None
+
+        if format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+            raise ImportError("Parquet metrics need pyarrow - pip install pyarrow")
+
+    def write(self, record):
+        """
+        Buffers one record. Columns missing from the record are left empty.
+
+        Args:
+            record (dict): The record.
+        """
+        for column in self.columns:
+            self.buffer[column].append(record.get(column))
+
+        self.size += 1
+        if self.size >= self.batch_size:
+            self.flush()
+
+    def write_many(self, columns):
+        """
+        Buffers many records given column by column.
+
+        Args:
+            columns (dict): Equal length sequences of values, keyed by column. Missing columns are left empty.
+        """
+        count = len(next(iter(columns.values())))
+        for column in self.columns:
+            values = columns.get(column)
+            if values is None:
+                self.buffer[column].extend([None] * count)
+            elif hasattr(values, "tolist"):
+                self.buffer[column].extend(values.tolist())
+            else:
+                self.buffer[column].extend(values)
+
+        self.size += count
+        if self.size >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered records to the file.
+        """
+        if self.size == 0:
+            return
+
+        if self.format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.table(self.buffer)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, table.schema)
+            self.writer.write_table(table.cast(self.writer.schema))
+
+        else:
+            if self.file is None:
+                self.file = open(self.path, "w", newline="")
+                if self.format == "csv":
+                    self.writer = csv.writer(self.file)
+                    self.writer.writerow(self.columns)
+
+            rows = zip(*(self.buffer[column] for column in self.columns))
+            if self.format == "csv":
+                self.writer.writerows(rows)
+            else:
+                self.file.writelines(
+                    json.dumps(dict(zip(self.columns, row)), default=float) + "\n"
+                    for row in rows
+                )
+
+        self.buffer = {column: [] for column in self.columns}
+        self.size = 0
+
+    def close(self):
+        self.flush()
+
+        if self.format == "parquet":
+            if self.writer is not None:
+                self.writer.close()
+        elif self.file is not None:
+            self.file.close()
+
+
+class MetricsSink:
+    """
+    Streams a run's per-block and per-interval records to files.
+
+    The records go to two files named after path, e.g. metrics.csv is written as metrics.blocks.csv
+    and metrics.intervals.csv. The format is taken from the extension unless given.
+
+    Attributes:
+        blocks: The stream of per-block records written by the mining loop.
+        intervals: The stream of per-interval records written by Stats every print interval.
+    """
+
+    def __init__(self, path, format=None, batch_size=10000):
+        root, extension = os.path.splitext(path)
+
+        if format is None:
+            format = extension.lstrip(".").lower() or "csv"
+
+        if format not in FORMATS:
+            raise ValueError(
+                f"Unknown metrics format: {format}. Must be one of {', '.join(FORMATS)}"
+            )
+
+        self.blocks = MetricsStream(
+            f"{root}.blocks.{format}", format, BLOCK_COLUMNS, batch_size
+        )
+        self.intervals = MetricsStream(
+            f"{root}.intervals.{format}", format, INTERVAL_COLUMNS, batch_size
+        )
+
+    def write_block(self, record):
+        self.blocks.write(record)
+
+    def write_blocks(self, columns):
+        self.blocks.write_many(columns)
+
+    def write_interval(self, record):
+        self.intervals.write(record)
+
+    def close(self):
+        self.blocks.close()
+        self.intervals.close()
@@ -0,0 +1,220 @@
+import cProfile
+import time
+
+
+class Profiler:
+    """
+    Opt-in per-phase timing of the simulation's hot paths.
+
+    Phases are timed by wrapping methods of the simulation objects in place with wrap, so a run without a
+    Profiler runs the original methods untouched. Each phase counts its calls, its wall and CPU time, and its
+    self time, which leaves out the time spent in phases it calls. A phase calling itself (a relay delivering
+    to a node that relays again) is only timed at its outermost call.
+
+    SimPy events are counted by wrapping the environment's step, and end_block closes the count of each block.
+
+    Attributes:
+        phases: [calls, wall, self wall, cpu, self cpu] of each phase, keyed by name.
+        stacks: Self wall time in seconds of each nesting of phases, keyed by the tuple of phase names.
+        frames: The phases running right now, innermost last.
+        active: The number of running calls of each phase.
+        events: The number of SimPy events processed.
+        block_events: The number of events since the last end_block.
+        blocks: The number of blocks ended.
+        max_block_events: The most events processed for one block.
+        cprofile: The cProfile.Profile run alongside, if one was asked for.
+        start_time: The wall time start was called.
+        wall: The wall time between start and stop.
+    """
+
+    def __init__(self, cprofile=False):
+        self.phases = {}
+        self.stacks = {}
+        self.frames = []
+        self.active = {}
+        self.events = 0
+        self.block_events = 0
+        self.blocks = 0
+        self.max_block_events = 0
+        self.cprofile = cProfile.Profile() if cprofile else None
+        self.start_time = None
+        self.wall = 0
+
+    def wrap(self, obj, names, phase):
+        """
+        Replaces methods of obj with versions timed under a phase.
+
+        Args:
+            obj: The object whose methods are wrapped. Its class is left untouched.
+            names (str or tuple): The name of the method, or a tuple of names.
+            phase (str): The phase the calls are timed under.
+        """
+        if isinstance(names, str):
+            names = (names,)
+
+        for name in names:
+            setattr(obj, name, self.timed(phase, getattr(obj, name)))
+
+    def timed(self, phase, func):
+        """
+        Returns func timed under a phase.
+        """
+        if phase not in self.phases:
+            self.phases[phase] = [0, 0.0, 0.0, 0.0, 0.0]
+            self.active[phase] = 0
+
+        totals = self.phases[phase]
+        active = self.active
+        frames = self.frames
+        stacks = self.stacks
+        wall_clock = time.perf_counter
+        cpu_clock = time.process_time
+
+        def wrapper(*args, **kwargs):
+            totals[0] += 1
+
+            # Already inside this phase, its outer call times it
+            if active[phase]:
+                return func(*args, **kwargs)
+
+            active[phase] += 1
+            # [name, child wall, child cpu]
+            frame = [phase, 0.0, 0.0]
+            frames.append(frame)
+            wall = wall_clock()
+            cpu = cpu_clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                wall = wall_clock() - wall
+                cpu = cpu_clock() - cpu
+                frames.pop()
+                active[phase] -= 1
+
+                totals[1] += wall
+                totals[2] += wall - frame[1]
+                totals[3] += cpu
+                totals[4] += cpu - frame[2]
+
+                key = tuple(f[0] for f in frames) + (phase,)
+                stacks[key] = stacks.get(key, 0.0) + wall - frame[1]
+
+                if frames:
+                    frames[-1][1] += wall
+                    frames[-1][2] += cpu
+
+        return wrapper
+
+    def count_events(self, env):
+        """
+        Counts the events env processes by wrapping its step in place.
+
+        Args:
+            env (simpy.Environment): The environment.
+        """
+        step = env.step
+
+        def counting_step():
+            self.block_events += 1
+            return step()
+
+        env.step = counting_step
+
+    def end_block(self):
+        """
+        Closes the event count of a block. Called by the mining loop once per block.
+        """
+        self.blocks += 1
+        self.events += self.block_events
+        if self.block_events > self.max_block_events:
+            self.max_block_events = self.block_events
+        self.block_events = 0
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        if self.cprofile is not None:
+            self.cprofile.enable()
+
+    def stop(self):
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        self.wall = time.perf_counter() - self.start_time
+
+        # Events after the last block, e.g. the workload's final ticks
+        self.events += self.block_events
+        self.block_events = 0
+
+    def get_summary_str(self):
+        """
+        Returns the table of phases, slowest first, and the event counts.
+
+        The time not spent in any phase is SimPy scheduling and everything left unwrapped.
+        """
+        rows = [("Phase", "Calls", "Wall s", "Self s", "CPU s", "Self CPU s", "Wall %")]
+        timed = 0.0
+
+        for phase, (calls, wall, self_wall, cpu, self_cpu) in sorted(
+            self.phases.items(), key=lambda x: x[1][2], reverse=True
+        ):
+            timed += self_wall
+            rows.append(
+                (
+                    phase,
+                    str(calls),
+                    f"{wall:.3f}",
+                    f"{self_wall:.3f}",
+                    f"{cpu:.3f}",
+                    f"{self_cpu:.3f}",
+                    f"{100 * self_wall / self.wall:.1f}" if self.wall else "0.0",
+                )
+            )
+
+        other = max(self.wall - timed, 0)
+        rows.append(
+            (
+                "other",
+                "",
+                f"{other:.3f}",
+                f"{other:.3f}",
+                "",
+                "",
+                f"{100 * other / self.wall:.1f}" if self.wall else "0.0",
+            )
+        )
+
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        lines = [
+            "  ".join(
+                value.ljust(width) if i == 0 else value.rjust(width)
+                for i, (value, width) in enumerate(zip(row, widths))
+            )
+            for row in rows
+        ]
+
+        lines.append(f"Wall time: {self.wall:.3f}s")
+        if self.events:
+            lines.append(
+                f"SimPy events: {self.events} | Per block: "
+                f"{round(self.events / max(self.blocks, 1), 2)} avg, {self.max_block_events} max"
+            )
+
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """
+        Writes the cProfile stats, if any, to <path>.pstats and the phase stacks to <path>.folded.
+
+        The .pstats file opens with pstats or snakeviz. The .folded file holds one "phase;phase microseconds"
+        line per nesting of phases, the collapsed stack format read by flamegraph.pl and speedscope.
+
+        Args:
+            path (str): The path the files are named after.
+        """
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(f"{path}.pstats")
+
+        timed = sum(self.stacks.values())
+        with open(f"{path}.folded", "w") as file:
+            for stack, seconds in sorted(self.stacks.items()):
+                file.write(f"{';'.join(stack)} {round(seconds * 1e6)}\n")
+            file.write(f"other {round(max(self.wall - timed, 0) * 1e6)}\n")
@@ -0,0 +1,152 @@
+from functools import partial
+
+from core import BLOCK_BASE_SIZE, TRANSACTION_SIZE
+
+
+# Message sizes in bytes, as in Bitcoin's P2P protocol
+HEADER_SIZE = 80
+# An inventory announcement or request naming one block
+INV_SIZE = 36
+SHORT_ID_SIZE = 6
+
+
+class HeaderFirstRelay:
+    """
+    Header-first relay. Nodes announce a new block's header to their neighbors, and a node that has not seen it
+    requests the full block from the first neighbor that announced it.
+
+    Every link carries a header, but each node downloads the full block once instead of once per neighbor,
+    at the cost of a request round trip per hop.
+    """
+
+    name = "header-first"
+
+    def announce(self, node, block, exclude=None):
+        exclude_id = None if exclude is None else exclude.id
+        for index, neighbor_id in enumerate(node.get_neighbor_ids()):
+            if neighbor_id != exclude_id:
+                node.send(block, index, HEADER_SIZE, self.receive_header)
+
+    def receive_header(self, node, block, sender, latency):
+        node.total_io_requests += 1
+
+        if block.block_id in node.seen or block.block_id in node.requested:
+            return
+
+        node.requested.add(block.block_id)
+        node.send_to(sender, block, INV_SIZE, self.receive_request, timed=False)
+
+    def receive_request(self, node, block, requester, latency):
+        node.total_io_requests += 1
+        node.send_to(requester, block, block.size, self.receive_full)
+
+    def receive_full(self, node, block, sender, latency):
+        node.total_io_requests += 1
+        node.requested.discard(block.block_id)
+        node.accept_block(block, sender, latency)
+
+    def get_summary_str(self, nodes):
+        return f"Relay: {self.name}"
+
+
+class CompactRelay:
+    """
+    Compact block relay (BIP 152 high bandwidth mode). Nodes send new blocks to their neighbors as the header,
+    a short id per transaction and the prefilled reward transaction.
+
+    The receiver rebuilds the block from the transactions already in its pool. Each transaction is there with
+    the node's mempool_overlap probability, and any missing ones are requested from the sender and sent
+    in one more round trip. Nodes keep no pools of their own, so the overlap is an assumed input rather than
+    measured from the transactions each node has seen, and the known and missing counts are drawn from it.
+
+    Attributes:
+        generator: The NumPy Generator the missing transactions are drawn from.
+    """
+
+    name = "compact"
+
+    def __init__(self, generator):
+        self.generator = generator
+
+    def announce(self, node, block, exclude=None):
+        size = HEADER_SIZE + SHORT_ID_SIZE * block.transaction_count
+        if block.transaction_count:
+            # The prefilled reward transaction
+            size += TRANSACTION_SIZE
+
+        exclude_id = None if exclude is None else exclude.id
+        for index, neighbor_id in enumerate(node.get_neighbor_ids()):
+            if neighbor_id != exclude_id:
+                node.send(block, index, size, self.receive_compact)
+
+    def receive_compact(self, node, block, sender, latency):
+        node.total_io_requests += 1
+
+        if block.block_id in node.seen or block.block_id in node.requested:
+            return
+
+        # The reward transaction is never in a pool, so it is sent prefilled
+        shared = max(block.transaction_count - 1, 0)
+        missing = 0
+        if shared and node.mempool_overlap < 1:
+            missing = int(self.generator.binomial(shared, 1 - node.mempool_overlap))
+
+        node.known_transactions += shared - missing
+        node.missing_transactions += missing
+
+        if missing == 0:
+            node.accept_block(block, sender, latency)
+            return
+
+        node.requested.add(block.block_id)
+        node.send_to(
+            sender,
+            block,
+            INV_SIZE + missing,
+            partial(self.receive_request, missing=missing),
+            timed=False,
+        )
+
+    def receive_request(self, node, block, requester, latency, missing):
+        node.total_io_requests += 1
+
+        # The missing transactions are taken to be the block's average size
+        average = (block.size - BLOCK_BASE_SIZE) / block.transaction_count
+        node.send_to(requester, block, missing * average, self.receive_missing)
+
+    def receive_missing(self, node, block, sender, latency):
+        node.total_io_requests += 1
+        node.requested.discard(block.block_id)
+        node.accept_block(block, sender, latency)
+
+    def get_summary_str(self, nodes):
+        known = sum(node.known_transactions for node in nodes)
+        missing = sum(node.missing_transactions for node in nodes)
+        overlap = known / (known + missing) * 100 if known + missing else 100
+        assumed = nodes[0].mempool_overlap * 100 if nodes else 100
+
+        return f"Relay: {self.name} | Mempool overlap: {round(assumed, 2)}% assumed, {round(overlap, 2)}% drawn | Missing transactions fetched: {missing}"
+
+
+RELAYS = ("full", "header-first", "compact")
+
+
+def get_relay(name, generator):
+    """
+    Returns the relay protocol with the given name, or None for full block relay.
+
+    Args:
+        name (str): The protocol. One of full, header-first or compact.
+        generator (numpy.random.Generator): The generator compact relay draws missing transactions from.
+
+    Raises:
+        ValueError: If the name is not a known protocol.
+    """
+    if name not in RELAYS:
+        raise ValueError(f"Unknown relay: {name}. Must be one of {', '.join(RELAYS)}")
+
+    if name == "header-first":
+        return HeaderFirstRelay()
+    if name == "compact":
+        return CompactRelay(generator)
+    return None
@@ -0,0 +1,377 @@
+import argparse
+import bz2
+import gzip
+import importlib.util
+import itertools
+import lzma
+
+import numpy as np
+
+from core import Transaction, TRANSACTION_SIZE
+
+
+# The columns of a trace, as stored in binary traces. size and fee are optional in CSV and Parquet traces.
+TRACE_DTYPE = np.dtype(
+    [
+        ("timestamp", "<f8"),
+        ("sender", "<i8"),
+        ("receiver", "<i8"),
+        ("amount", "<f8"),
+        ("size", "<i8"),
+        ("fee", "<f8"),
+    ]
+)
+REQUIRED_COLUMNS = ("timestamp", "sender", "receiver", "amount")
+
+OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+
+def get_format(path):
+    """
+    Returns the format of a trace from its extension and whether it is compressed.
+
+    Raises:
+        ValueError: If the extension is not a known format, or a binary trace is compressed.
+    """
+    name = path.lower()
+    compressed = name.endswith(tuple(OPENERS))
+    if compressed:
+        name = name.rsplit(".", 1)[0]
+
+    for extension, format in (
+        (".csv", "csv"),
+        (".parquet", "parquet"),
+        (".npy", "npy"),
+        (".bin", "binary"),
+    ):
+        if name.endswith(extension):
+            if compressed and format in ("parquet", "npy", "binary"):
+                raise ValueError(
+                    f"Trace {path} cannot be compressed. Only CSV traces can be, {format} traces are read in place"
+                )
+            return format, compressed
+
+    raise ValueError(
+        f"Unknown trace format: {path}. Must be .csv (optionally .gz, .bz2 or .xz), .parquet, .npy or .bin"
+    )
+
+
+def make_chunk(columns, count):
+    """
+    Builds a chunk of trace rows from the columns a file has. Missing columns are left 0.
+    """
+    chunk = np.zeros(count, dtype=TRACE_DTYPE)
+    for name, values in columns.items():
+        chunk[name] = values
+    return chunk
+
+
+def check_columns(path, names):
+    missing = [name for name in REQUIRED_COLUMNS if name not in names]
+    if missing:
+        raise ValueError(f"Trace {path} is missing columns: {', '.join(missing)}")
+
+
+def read_csv_chunks(path, chunk_rows, compressed=False):
+    """
+    Reads a CSV trace with a header row. Columns the trace does not use are skipped. Wallet ids must be integers.
+    """
+    opener = open
+    if compressed:
+        opener = OPENERS["." + path.lower().rsplit(".", 1)[1]]
+
+    with opener(path, "rt", newline="") as file:
+        header = [name.strip().lower() for name in file.readline().split(",")]
+        check_columns(path, header)
+        names = [name for name in TRACE_DTYPE.names if name in header]
+        usecols = [header.index(name) for name in names]
+
+        while True:
+            lines = list(itertools.islice(file, chunk_rows))
+            if not lines:
+                break
+
+            # Parsed in C a chunk at a time, rather than row by row
+            rows = np.loadtxt(
+                lines, delimiter=",", usecols=usecols, dtype=float, ndmin=2
+            )
+            yield make_chunk(
+                {name: rows[:, i] for i, name in enumerate(names)}, len(rows)
+            )
+
+
+def read_parquet_chunks(path, chunk_rows):
+    """
+    Reads a Parquet trace one batch of row groups at a time.
+    """
+    if importlib.util.find_spec("pyarrow") is None:
+        raise ImportError("Parquet traces need pyarrow - pip install pyarrow")
+
+    import pyarrow.parquet as pq
+
+    file = pq.ParquetFile(path)
+    check_columns(path, file.schema_arrow.names)
+    names = [name for name in TRACE_DTYPE.names if name in file.schema_arrow.names]
+
+    for batch in file.iter_batches(batch_size=chunk_rows, columns=names):
+        yield make_chunk(
+            {
+                name: batch.column(name).to_numpy(zero_copy_only=False)
+                for name in names
+            },
+            batch.num_rows,
+        )
+
+
+def read_binary_chunks(path, chunk_rows, format="binary"):
+    """
+    Reads a memory-mapped trace, either raw TRACE_DTYPE records (.bin) or a structured NumPy array (.npy).
+
+    Only the pages of the chunk being replayed are read from disk.
+    """
+    if format == "npy":
+        records = np.load(path, mmap_mode="r")
+        if records.dtype.names is None:
+            raise ValueError(f"Trace {path} is not a structured array")
+        check_columns(path, records.dtype.names)
+    else:
+        records = np.memmap(path, dtype=TRACE_DTYPE, mode="r")
+
+    names = [name for name in TRACE_DTYPE.names if name in records.dtype.names]
+    for start in range(0, len(records), chunk_rows):
+        rows = records[start : start + chunk_rows]
+        yield make_chunk({name: rows[name] for name in names}, len(rows))
+
+
+def read_chunks(path, chunk_rows=100000):
+    """
+    Reads a trace chunk_rows rows at a time, so a trace of any length takes the memory of one chunk.
+
+    Args:
+        path (str): The trace. CSV (plain, .gz, .bz2 or .xz), Parquet (needs pyarrow), .npy or raw .bin records.
+        chunk_rows (int, optional): The rows per chunk. Defaults to 100000.
+
+    Yields:
+        numpy.ndarray: The rows of each chunk as TRACE_DTYPE records.
+    """
+    format, compressed = get_format(path)
+
+    if format == "csv":
+        yield from read_csv_chunks(path, chunk_rows, compressed)
+    elif format == "parquet":
+        yield from read_parquet_chunks(path, chunk_rows)
+    else:
+        yield from read_binary_chunks(path, chunk_rows, format)
+
+
+def convert_trace(source, destination, chunk_rows=100000):
+    """
+    Converts a trace to raw TRACE_DTYPE records, which replay memory-mapped without any parsing.
+
+    Returns:
+        int: The number of rows written.
+    """
+    count = 0
+    with open(destination, "wb") as file:
+        for chunk in read_chunks(source, chunk_rows):
+            chunk.tofile(file)
+            count += len(chunk)
+    return count
+
+
+def make_transaction(env, sender, receiver, amount, size, fee_rate):
+    """
+    Builds a trace transaction without the balance checks of Transaction.__init__, the trace being the record.
+    """
+    transaction = Transaction.__new__(Transaction)
+    transaction.size = size
+    transaction.fee_rate = fee_rate
+    transaction.creation_time = env.now
+    transaction.proceess_time = None
+    transaction.sender = sender
+    transaction.receiver = receiver
+    transaction.amount = amount
+    transaction.type = "Transaction"
+    return transaction
+
+
+class TraceWorkload:
+    """
+    Replays a recorded transaction trace as the workload, adding each transaction to the pool at its recorded time.
+
+    The trace is read chunk_rows rows at a time, so traces of hundreds of millions of rows replay in the memory
+    of one chunk. Consecutive rows with the same timestamp are added as one batch. Trace times are shifted to
+    start when the workload does and multiplied by time_scale, so 0.1 replays ten times faster. Rows are replayed
+    in file order, and a row timestamped before the one it follows is added at once.
+
+    Trace wallet ids are folded onto the simulation's wallets by id modulo the number of wallets, and rows whose
+    sender and receiver fold onto the same wallet are skipped. Each sender is debited the amount plus the fee
+    without checking its balance, so balances follow the trace and may go negative. The fee is bid as a fee rate,
+    so the receiver gets the amount and the miner the fee in fee market mode. Rows with no size are given the
+    fixed transaction size, and sizes are clipped to max_size so every transaction fits in an empty block.
+
+    Attributes:
+        env: The environment.
+        wallets: The wallets.
+        blockchain: The blockchain.
+        path: The trace file.
+        time_scale: The factor the gaps between trace timestamps are multiplied by.
+        end: Whether to stop the blockchain once the trace has been replayed.
+        max_size: The largest transaction size, or None for no limit.
+        skipped: The number of rows skipped as self-sends or moving nothing.
+        chunks: The iterator over the trace's chunks.
+        origin: The first timestamp of the trace, once read.
+        start: The time the replay started.
+        tx_count: The number of transactions replayed so far.
+        next_tick: The time of the next batch.
+    """
+
+    def __init__(
+        self,
+        env,
+        wallets,
+        blockchain,
+        path,
+        time_scale=1.0,
+        chunk_rows=100000,
+        end=False,
+        max_size=None,
+    ):
+        if time_scale <= 0:
+            raise ValueError("Trace time scale must be greater than 0")
+
+        if chunk_rows < 1:
+            raise ValueError("Trace chunks must have at least 1 row")
+
+        if len(wallets) < 2:
+            raise ValueError("At least 2 wallets are needed to replay a trace")
+
+        if max_size is not None and max_size < 1:
+            raise ValueError("Largest transaction size must be at least 1 byte")
+
+        # Fails before the run starts rather than when the first chunk is read
+        get_format(path)
+
+        self.env = env
+        self.wallets = wallets
+        self.blockchain = blockchain
+        self.path = path
+        self.time_scale = time_scale
+        self.end = end
+        self.max_size = max_size
+        self.skipped = 0
+        self.chunks = read_chunks(path, chunk_rows)
+        self.origin = None
+        self.start = env.now
+        self.tx_count = 0
+        self.next_tick = env.now
+
+    def run(self, delay=0):
+        """
+        The workload process. Adds each batch of the trace to the pool at its time until the trace runs out.
+
+        Args:
+            delay (float, optional): The time until the first batch. Defaults to 0.
+        """
+        if delay > 0:
+            yield self.env.timeout(delay)
+
+        for chunk in self.chunks:
+            if self.origin is None:
+                self.origin = float(chunk["timestamp"][0])
+
+            times = self.start + (chunk["timestamp"] - self.origin) * self.time_scale
+
+            # The start of every run of rows with the same time
+            bounds = np.concatenate(
+                ([0], np.flatnonzero(np.diff(times)) + 1, [len(chunk)])
+            ).tolist()
+
+            for begin, stop in zip(bounds[:-1], bounds[1:]):
+                if self.blockchain.stop_process:
+                    break
+
+                self.next_tick = max(float(times[begin]), self.env.now)
+                if self.next_tick > self.env.now:
+                    yield self.env.timeout(self.next_tick - self.env.now)
+
+                self.add_batch(chunk[begin:stop])
+
+            if self.blockchain.stop_process:
+                break
+
+        if self.end:
+            self.blockchain.stop_process = True
+
+    def add_batch(self, rows):
+        """
+        Adds a batch of trace rows to the pool.
+
+        Args:
+            rows (numpy.ndarray): The rows, as TRACE_DTYPE records.
+
+        Returns:
+            int: The number of transactions added.
+        """
+        count = len(self.wallets)
+        fees = np.maximum(rows["fee"], 0)
+        totals = rows["amount"] + fees
+        senders = rows["sender"] % count
+        receivers = rows["receiver"] % count
+
+        # A transaction moving nothing, or between ids folded onto the same wallet, has no effect on the chain
+        kept = (totals > 0) & (senders != receivers)
+        self.skipped += len(rows) - int(np.count_nonzero(kept))
+        rows, fees, totals = rows[kept], fees[kept], totals[kept]
+        senders, receivers = senders[kept], receivers[kept]
+        if len(rows) == 0:
+            return 0
+
+        # Clipped so no transaction is too big for any block, which would stop blocks filling past it
+        sizes = np.where(rows["size"] > 0, rows["size"], TRANSACTION_SIZE)
+        if self.max_size is not None:
+            sizes = np.minimum(sizes, self.max_size)
+
+        transactions = [
+            make_transaction(
+                self.env,
+                self.wallets[sender],
+                self.wallets[receiver],
+                total,
+                size,
+                fee / size,
+            )
+            for sender, receiver, total, size, fee in zip(
+                senders.tolist(),
+                receivers.tolist(),
+                totals.tolist(),
+                sizes.tolist(),
+                fees.tolist(),
+            )
+        ]
+
+        # Each sender is debited once for the whole batch
+        debits = np.bincount(senders, weights=totals, minlength=count)
+        sent = np.bincount(senders, minlength=count)
+        for sender in np.flatnonzero(sent).tolist():
+            wallet = self.wallets[sender]
+            wallet.balance -= float(debits[sender])
+            wallet.tx_out += int(sent[sender])
+
+        self.blockchain.add_transactions(transactions)
+        self.tx_count += len(transactions)
+
+        return len(transactions)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert a CSV or Parquet trace to raw binary records, which replay memory-mapped."
+    )
+    parser.add_argument("source", type=str)
+    parser.add_argument("destination", type=str)
+    parser.add_argument("--chunk-rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    rows = convert_trace(args.source, args.destination, args.chunk_rows)
+    print(f"Wrote {rows} rows to {args.destination}")
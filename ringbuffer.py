@@ -0,0 +1,157 @@
+import numpy as np
+
+
+class RingBuffer:
+    """
+    A fixed-capacity buffer of the most recent floats of a time series, with running sums.
+
+    Only the last capacity values are stored, so memory stays the same however long the run is.
+    The sum of the last k values is kept up to date for every window k registered with add_window,
+    and the sum of every value ever added is kept in total, so reading them is O(1).
+    Window sums are recomputed from the stored values once per capacity appends to stop float error building up.
+
+    Attributes:
+        capacity: The number of values stored.
+        values: The stored values. The newest is at (count - 1) % capacity.
+        count: The number of values ever added.
+        total: The sum of every value ever added.
+        sums: The sum of the last k values, keyed by window size k.
+        since_refresh: The number of appends since the window sums were last recomputed.
+    """
+
+    def __init__(self, capacity=1, windows=()):
+        self.capacity = max([capacity, *windows])
+        self.values = np.zeros(self.capacity)
+        self.count = 0
+        self.total = 0.0
+        self.sums = {}
+        self.since_refresh = 0
+
+        for window in windows:
+            self.add_window(window)
+
+    def add_window(self, window):
+        """
+        Starts keeping the running sum of the last window values, growing the buffer if it is too small.
+
+        Args:
+            window (int): The window size.
+        """
+        if window <= 0:
+            raise ValueError("Window must be greater than 0")
+
+        if window > self.capacity:
+            size = len(self)
+            values = np.zeros(window)
+            values[np.arange(self.count - size, self.count) % window] = (
+                self.get_positions(size)
+            )
+            self.values = values
+            self.capacity = window
+
+        self.sums[window] = self.get_window_sum(window)
+
+    def get_positions(self, n):
+        """
+        Returns the last n stored values, oldest first.
+        """
+        start = (self.count - n) % self.capacity
+        if start + n <= self.capacity:
+            return self.values[start : start + n]
+        return np.concatenate(
+            (self.values[start:], self.values[: start + n - self.capacity])
+        )
+
+    def get_window_sum(self, window):
+        return float(self.get_positions(min(window, len(self))).sum())
+
+    def refresh(self):
+        """
+        Recomputes every window sum from the stored values.
+        """
+        for window in self.sums:
+            self.sums[window] = self.get_window_sum(window)
+        self.since_refresh = 0
+
+    def append(self, value):
+        for window in self.sums:
+            if self.count >= window:
+                self.sums[window] -= float(
+                    self.values[(self.count - window) % self.capacity]
+                )
+            self.sums[window] += value
+
+        self.values[self.count % self.capacity] = value
+        self.count += 1
+        self.total += value
+
+        self.since_refresh += 1
+        if self.since_refresh >= self.capacity:
+            self.refresh()
+
+    def extend(self, values):
+        """
+        Appends many values at once. Only the last capacity of them are written.
+
+        Args:
+            values (array_like): The values to append, oldest first.
+        """
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return
+
+        self.total += float(values.sum())
+
+        kept = values[-self.capacity :]
+        start = self.count + len(values) - len(kept)
+        self.values[np.arange(start, start + len(kept)) % self.capacity] = kept
+        self.count += len(values)
+
+        self.refresh()
+
+    def sum(self, window=None):
+        """
+        Returns the sum of the last window values, or of every value ever added if window is None.
+
+        Registered windows are O(1), any other window is summed from the stored values.
+        """
+        if window is None:
+            return self.total
+        if window in self.sums:
+            return self.sums[window]
+        if window > self.capacity:
+            raise ValueError("Window is larger than the buffer")
+        return self.get_window_sum(window)
+
+    def get_index(self, index):
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("RingBuffer index out of range")
+        return (self.count - size + index) % self.capacity
+
+    def __getitem__(self, index):
+        return float(self.values[self.get_index(index)])
+
+    def __setitem__(self, index, value):
+        position = self.get_index(index)
+        delta = value - float(self.values[position])
+
+        # The element is in a window if it is one of that window's last values
+        age = (self.count - 1 - position) % self.capacity
+        for window in self.sums:
+            if age < window:
+                self.sums[window] += delta
+
+        self.values[position] = value
+        self.total += delta
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def __iter__(self):
+        return iter(self.get_positions(len(self)).tolist())
+
+    def __repr__(self):
+        return f"RingBuffer(capacity={self.capacity}, count={self.count}, total={self.total})"
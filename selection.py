@@ -0,0 +1,92 @@
+import random
+import bisect
+import itertools
+
+
+class WinnerSelector:
+    """
+    Picks the winner of each block in O(log n) with a single exponential draw.
+
+    The minimum of independent exponential mining times is itself exponential with the summed rate,
+    and the miner that attains it is chosen with probability proportional to its hashrate.
+    So instead of drawing one mine time per miner, one inter-block time is drawn from the total hashrate
+    and the winner is picked from a cumulative-hashrate table with bisect.
+
+    The table is only rebuilt when a miner's hashrate changes or the miner set changes.
+
+    Attributes:
+        miners: The miners taking part in the selection.
+        cumulative: The running sum of the miners' hashrates.
+        total_hashrate: The sum of all hashrates.
+        dirty: Whether the table must be rebuilt before the next draw.
+        rng: The random number stream the draws come from.
+    """
+
+    def __init__(self, miners, rng=random):
+        self.miners = list(miners)
+        self.rng = rng
+        self.cumulative = []
+        self.total_hashrate = 0
+        self.dirty = True
+
+        for miner in self.miners:
+            miner.selector = self
+
+    def invalidate(self):
+        """
+        Marks the cumulative table as stale. Called by a miner when its hashrate changes.
+        """
+        self.dirty = True
+
+    def add_miner(self, miner):
+        self.miners.append(miner)
+        miner.selector = self
+        self.invalidate()
+
+    def remove_miner(self, miner):
+        self.miners.remove(miner)
+        miner.selector = None
+        self.invalidate()
+
+    def rebuild(self):
+        """
+        Rebuilds the cumulative-hashrate table from the current miners.
+        """
+        self.cumulative = list(
+            itertools.accumulate(miner.hashrate for miner in self.miners)
+        )
+        self.total_hashrate = self.cumulative[-1] if self.cumulative else 0
+        self.dirty = False
+
+    def select(self, difficulty):
+        """
+        Draws the time until the next block and the miner that finds it.
+
+        The winner's mine_time is set to the drawn time so it can be used the same way as Miner.get_mine_time.
+
+        Args:
+            difficulty (float): The current difficulty.
+
+        Returns:
+            Miner: The winning miner.
+        """
+        if self.dirty:
+            self.rebuild()
+
+        if not self.miners:
+            raise ValueError("No miners to select a winner from")
+
+        if self.total_hashrate == 0:
+            winner = self.miners[0]
+            winner.mine_time = float("inf")
+            return winner
+
+        mine_time = self.rng.expovariate(self.total_hashrate / difficulty)
+
+        index = bisect.bisect_right(
+            self.cumulative, self.rng.random() * self.total_hashrate
+        )
+        winner = self.miners[min(index, len(self.miners) - 1)]
+        winner.mine_time = mine_time
+
+        return winner
@@ -8,21 +8,180 @@ if __name__ == "__main__":
     parser.add_argument("--miners", type=int, default=5)
     parser.add_argument("--nodes", type=int, default=2)
     parser.add_argument("--neighbors", type=int, default=1)
+    parser.add_argument(
+        "--topology",
+        choices=[
+            "random",
+            "regular",
+            "erdos-renyi",
+            "scale-free",
+            "small-world",
+            "geographic",
+        ],
+        default="random",
+        help="How nodes are linked. --neighbors is the number each node picks for random and the average degree for the others.",
+    )
     parser.add_argument("--wallets", type=int, default=10)
     parser.add_argument("--hashrate", type=int, default=10000)
     parser.add_argument("--blocktime", type=float, default=100)
     parser.add_argument("--print", type=int, default=144)
     parser.add_argument("--transactions", type=int, default=0)
     parser.add_argument("--blocksize", type=int, default=100)
+    parser.add_argument(
+        "--arrivals",
+        choices=["fixed", "poisson", "bursty", "diurnal"],
+        default="fixed",
+        help="How wallet transaction ticks arrive. Every model averages one tick per --interval.",
+    )
     parser.add_argument("--interval", type=float, default=10)
     parser.add_argument("--reward", type=float, default=50)
     parser.add_argument("--halving", type=int, default=210000)
     parser.add_argument("--years", type=int, default=1)
     parser.add_argument("--latency", type=float, default=0)
     parser.add_argument("--bandwidth", type=int, default=float("inf"))
+    parser.add_argument(
+        "--link-latency",
+        type=str,
+        default=None,
+        help="Per-link latency distribution, e.g. lognormal:0.05,0.5. One of constant, uniform, normal, lognormal, exponential or pareto.",
+    )
+    parser.add_argument(
+        "--link-bandwidth",
+        type=str,
+        default=None,
+        help="Per-link bandwidth distribution, e.g. pareto:100000,1.5.",
+    )
+    parser.add_argument(
+        "--link-config",
+        type=str,
+        default=None,
+        help="JSON file of link distributions, peer classes and region RTTs. --link-latency and --link-bandwidth override its distributions.",
+    )
+    parser.add_argument(
+        "--relay",
+        choices=["full", "header-first", "compact"],
+        default="full",
+        help="How blocks are relayed: full blocks to every neighbor, header announcements then one download, or compact blocks with missing transactions fetched.",
+    )
+    parser.add_argument(
+        "--mempool-overlap",
+        type=float,
+        default=0.99,
+        help="Assumed probability each transaction of a compact block is already in the receiving node's pool. Nodes keep no pools of their own, so it is an input, not a measurement.",
+    )
+    parser.add_argument(
+        "--forks",
+        action="store_true",
+        help="Mine each block on the winning miner's node tip while the last one spreads, so blocks can compete. Reports stale rate and reorgs.",
+    )
+    parser.add_argument(
+        "--finality",
+        type=int,
+        default=100,
+        help="Depth below the tip beyond which block trees are pruned, with --forks.",
+    )
     parser.add_argument("--fee", type=float, default=0)
+    parser.add_argument(
+        "--fee-rates",
+        type=str,
+        default=None,
+        help="Distribution of the fee per byte each transaction bids, e.g. lognormal:0.00001,1. Blocks take the highest fee rates first. Replaces --fee.",
+    )
+    parser.add_argument(
+        "--pool-bytes",
+        type=int,
+        default=None,
+        help="Evict the lowest fee rate transactions once the pool holds more than this many bytes, with --fee-rates.",
+    )
+    parser.add_argument(
+        "--tx-sizes",
+        type=str,
+        default=None,
+        help="Distribution of transaction sizes in bytes: inputs-outputs:<mean inputs>,<mean outputs>, histogram:<size,count CSV> or a distribution like lognormal:400,0.6. Fixed at 256 if not set.",
+    )
+    parser.add_argument(
+        "--block-bytes",
+        type=int,
+        default=None,
+        help="Fill blocks up to this many bytes, header included, instead of --blocksize transactions.",
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        default=None,
+        help="Replay transactions from a trace of timestamp,sender,receiver,amount[,size,fee] rows instead of generating them: .csv (optionally .gz, .bz2 or .xz), .parquet (needs pyarrow), .npy or .bin records.",
+    )
+    parser.add_argument(
+        "--trace-scale",
+        type=float,
+        default=1.0,
+        help="Multiply the gaps between trace timestamps by this, e.g. 0.1 to replay ten times faster.",
+    )
+    parser.add_argument(
+        "--trace-chunk",
+        type=int,
+        default=100000,
+        help="Trace rows read into memory at a time.",
+    )
     parser.add_argument("--difficulty", type=float, default=None)
     parser.add_argument("--blocks", type=int, default=None)
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed for the topology, mining and transaction random streams. Random if not set.",
+    )
+    parser.add_argument(
+        "--fee-priority",
+        action="store_true",
+        help="Add the highest fee transactions to blocks first instead of FIFO.",
+    )
+    parser.add_argument(
+        "--fast-forward",
+        action="store_true",
+        help="Skip SimPy and draw blocks in batches. Requires --transactions 0, no latency and no bandwidth limit.",
+    )
+    parser.add_argument(
+        "--precompute-delays",
+        action="store_true",
+        help="Charge blocks from shortest-path delays computed once for the static topology instead of relaying them hop by hop.",
+    )
+    parser.add_argument(
+        "--delay-bucket",
+        type=int,
+        default=4096,
+        help="With --precompute-delays, pick block paths for sizes rounded up to this many bytes. Larger buckets mean fewer path searches but approximate path choice, 1 matches hop by hop relay exactly.",
+    )
+    parser.add_argument(
+        "--metrics-out",
+        type=str,
+        default=None,
+        help="Stream per-block and per-interval metrics to files named after this path. Format from the extension: .csv, .jsonl or .parquet (needs pyarrow).",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        default=None,
+        help="Save the simulation to this file every --checkpoint-every blocks.",
+    )
+    parser.add_argument("--checkpoint-every", type=int, default=100000)
+    parser.add_argument(
+        "--resume",
+        type=str,
+        default=None,
+        help="Resume from a checkpoint file. Pass the same options as the checkpointed run, the seed is taken from the checkpoint.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Time the hot phases of the run, count SimPy events per block and print a summary at the end.",
+    )
+    parser.add_argument(
+        "--profile-out",
+        type=str,
+        default=None,
+        help="Also run cProfile and write <path>.pstats and <path>.folded (collapsed stacks for flamegraphs). Implies --profile.",
+    )
     parser.add_argument(
         "--debug", action="store_true", help="Print summary every block if set."
     )
@@ -33,13 +192,21 @@ if __name__ == "__main__":
         print_interval = 1
 
     print(
-        f"Miners: {args.miners} | Nodes: {args.nodes} | Neighbors: {args.neighbors} | Wallets: {args.wallets} | Hashrate: {args.hashrate} | Blocktime: {args.blocktime} | Print: {args.print} | Transactions: {args.transactions} | Blocksize: {args.blocksize} | Interval: {args.interval} | Reward: {args.reward} | Halving: {args.halving} | Years: {args.years} | Blocks: {args.blocks} | Difficulty: {args.difficulty} | Latency: {args.latency} | Bandwidth: {args.bandwidth} | Fee: {args.fee}"
+        f"Miners: {args.miners} | Nodes: {args.nodes} | Neighbors: {args.neighbors} | Topology: {args.topology} | Wallets: {args.wallets} | Hashrate: {args.hashrate} | Blocktime: {args.blocktime} | Print: {args.print} | Transactions: {args.transactions} | Blocksize: {args.blocksize} | Interval: {args.interval} | Arrivals: {args.arrivals} | Reward: {args.reward} | Halving: {args.halving} | Years: {args.years} | Blocks: {args.blocks} | Difficulty: {args.difficulty} | Latency: {args.latency} | Bandwidth: {args.bandwidth} | Fee: {args.fee} | Seed: {args.seed}"
     )
 
     main(
         num_miners=args.miners,
         num_nodes=args.nodes,
         num_neighbors=args.neighbors,
+        topology=args.topology,
+        link_latency=args.link_latency,
+        link_bandwidth=args.link_bandwidth,
+        link_config=args.link_config,
+        relay=args.relay,
+        mempool_overlap=args.mempool_overlap,
+        forks=args.forks,
+        finality=args.finality,
         num_wallets=args.wallets,
         hashrate=args.hashrate,
         blocktime=args.blocktime,
@@ -53,6 +220,25 @@ if __name__ == "__main__":
         latency=args.latency,
         bandwidth=args.bandwidth,
         fee=args.fee,
+        fee_priority=args.fee_priority,
+        fee_rates=args.fee_rates,
+        pool_bytes=args.pool_bytes,
+        tx_sizes=args.tx_sizes,
+        block_bytes=args.block_bytes,
+        trace=args.trace,
+        trace_scale=args.trace_scale,
+        trace_chunk=args.trace_chunk,
+        fast_forward=args.fast_forward,
+        precompute_delays=args.precompute_delays,
+        delay_bucket=args.delay_bucket,
         difficulty=args.difficulty,
         blocks=args.blocks,
+        seed=args.seed,
+        arrivals=args.arrivals,
+        metrics_out=args.metrics_out,
+        checkpoint=args.checkpoint,
+        checkpoint_every=args.checkpoint_every,
+        resume=args.resume,
+        profile=args.profile,
+        profile_out=args.profile_out,
     )
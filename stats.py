@@ -1,4 +1,14 @@
 import math
+from ringbuffer import RingBuffer
+from histogram import LogHistogram
+
+# The confirmation latency percentiles reported, keyed by their print_dict key
+LATENCY_PERCENTILES = {
+    "latency_p50": 50,
+    "latency_p90": 90,
+    "latency_p99": 99,
+    "latency_p999": 99.9,
+}
 
 
 class Stats:
@@ -19,16 +29,22 @@ class Stats:
         blockchain,
         difficulty,
         blocks=None,
+        metrics=None,
+        tree=None,
     ):
 
         self.print_interval = print_interval
         self.diff_interval = diff_interval
 
-        self.block_times = []
-        self.total_times = []
+        # Only the block count and the last diff_interval / print_interval times are ever read
+        self.block_times = RingBuffer()
+        self.total_times = RingBuffer(windows=(diff_interval, print_interval))
         self.difficulty = difficulty
 
         self.nodes = nodes
+        for node in nodes:
+            node.broadcast_times.add_window(print_interval)
+
         self.diff_interval = diff_interval
         self.blockchain = blockchain
         self.blocktime = blocktime
@@ -39,6 +55,11 @@ class Stats:
             self.total_blocks = blocks
 
         self.env = env
+        self.metrics = metrics
+        # The tree of every mined block, if forks are modelled
+        self.tree = tree
+        # Every confirmation latency of the run, merged in from the blockchain's at each print
+        self.latencies = LogHistogram()
         self.last_print_time = 0
         self.old_fees = 0
 
@@ -58,6 +79,10 @@ class Stats:
             "nmb": 0,
             "fees": 0,
             "network_time": 0,
+            "stale_rate": 0,
+            "reorgs": 0,
+            "max_reorg_depth": 0,
+            **{key: None for key in LATENCY_PERCENTILES},
         }
 
     def get_stats_str(self):
@@ -88,6 +113,21 @@ class Stats:
         if self.print_dict["fees"] > 0 or self.old_fees > 0:
             print_list.append(f"AFB:{round(self.print_dict['fees'], 2)}")
 
+        # An interval with no confirmations has no percentiles, which is not the same as a latency of 0
+        if self.latencies.count > 0:
+            if self.print_dict["latency_p50"] is None:
+                print_list.append("Lat p50/p90/p99/p999:n/a")
+            else:
+                percentiles = "/".join(
+                    str(round(self.print_dict[key], 2)) for key in LATENCY_PERCENTILES
+                )
+                print_list.append(f"Lat p50/p90/p99/p999:{percentiles}s")
+
+        if self.tree is not None:
+            print_list.append(
+                f"Stale:{round(self.print_dict['stale_rate'] * 100, 2)}% Reorgs:{self.print_dict['reorgs']} Max Reorg:{self.print_dict['max_reorg_depth']}"
+            )
+
         return " ".join(print_list)
 
     def add_block_time(self, block_time):
@@ -102,7 +142,7 @@ class Stats:
             self.difficulty
             * (
                 self.blocktime
-                / (sum(self.total_times[-self.diff_interval :]) / self.diff_interval)
+                / (self.total_times.sum(self.diff_interval) / self.diff_interval)
             )
         )
 
@@ -145,11 +185,18 @@ class Stats:
 
         self.set_io_requests()
 
+        self.set_forks()
+
+        self.set_latency()
+
         self.last_print_time = self.env.now
 
+        if self.metrics is not None:
+            self.metrics.write_interval({"time": self.env.now, **self.print_dict})
+
     def set_abt(self):
         self.print_dict["abt"] = (
-            sum(self.total_times[-self.print_interval :]) / self.print_interval
+            self.total_times.sum(self.print_interval) / self.print_interval
         )
 
     def set_tps(self, time_since_last_print):
@@ -221,6 +268,42 @@ class Stats:
 
     def set_network_time(self):
         # This is the sum of each node's broadcast times for the last print interval blocks
+        # Broadcasts add the latency and transmit time of each link they used, so per-link models show up here
         self.print_dict["network_time"] = sum(
-            sum(node.broadcast_times[-self.print_interval :]) for node in self.nodes
+            node.broadcast_times.sum(self.print_interval) for node in self.nodes
+        )
+
+    def set_latency(self):
+        # Percentiles of the transactions confirmed since the last print, which then join the whole run's
+        # None when nothing was confirmed since the last print
+        interval = self.blockchain.latencies
+        for key, percentile in LATENCY_PERCENTILES.items():
+            self.print_dict[key] = (
+                interval.get_percentile(percentile) if interval.count else None
+            )
+
+        self.latencies.merge(interval)
+        interval.reset()
+
+    def get_latency_str(self):
+        """
+        Returns the confirmation latency percentiles of the whole run.
+        """
+        percentiles = " ".join(
+            f"p{str(percentile).replace('.', '')}:{round(self.latencies.get_percentile(percentile), 2)}s"
+            for percentile in LATENCY_PERCENTILES.values()
+        )
+        return f"Confirmation latency: Tx:{self.latencies.count} Mean:{round(self.latencies.get_mean(), 2)}s {percentiles}"
+
+    def set_forks(self):
+        # Stale blocks are counted once over every mined block, reorgs are counted by every node that switched
+        if self.tree is None:
+            return
+
+        self.print_dict["stale_rate"] = (
+            self.tree.get_stale_count() / self.tree.added if self.tree.added else 0
+        )
+        self.print_dict["reorgs"] = sum(node.tree.reorgs for node in self.nodes)
+        self.print_dict["max_reorg_depth"] = max(
+            node.tree.max_reorg_depth for node in self.nodes
         )
@@ -0,0 +1,49 @@
+import random
+
+import numpy as np
+
+from variates import BufferedVariates
+
+
+class RandomStreams:
+    """
+    Independent random number streams for each part of the simulation.
+
+    The topology, mining and transaction streams are spawned from one seed, so a run can be reproduced from
+    its seed and changing one part of the simulation (e.g. the wallet workload) does not change the random
+    numbers drawn by another (e.g. the mining sequence). This keeps common random numbers across compared runs.
+
+    The mining and transaction streams are drawn per block and per transaction, so they are BufferedVariates
+    that pre-generate their draws with NumPy.
+
+    Attributes:
+        seed: The seed the streams were spawned from. Generated from OS entropy if none was given.
+        topology: The stream for the node graph and miner placement.
+        mining: The stream for block times and winners.
+        transactions: The stream for transaction receivers and amounts.
+        mining_batch: A NumPy Generator for batched mining draws, independent of the other streams.
+        relay: A NumPy Generator for the transactions compact relay finds missing from pools.
+        fees: A NumPy Generator for the fee rates wallets bid in fee market mode.
+        sizes: A NumPy Generator for transaction sizes, if they follow a distribution.
+    """
+
+    def __init__(self, seed=None):
+        sequence = np.random.SeedSequence(seed)
+        self.seed = sequence.entropy
+
+        # Spawned children only depend on their position, so adding a stream leaves the others unchanged
+        topology, mining, transactions, mining_batch, relay, fees, sizes = (
+            sequence.spawn(7)
+        )
+
+        self.topology = random.Random(self.get_seed(topology))
+        self.mining = BufferedVariates(np.random.default_rng(mining))
+        self.transactions = BufferedVariates(np.random.default_rng(transactions))
+        self.mining_batch = np.random.default_rng(mining_batch)
+        self.relay = np.random.default_rng(relay)
+        self.fees = np.random.default_rng(fees)
+        self.sizes = np.random.default_rng(sizes)
+
+    @staticmethod
+    def get_seed(sequence):
+        return int(sequence.generate_state(1, np.uint64)[0])
@@ -0,0 +1,363 @@
+import argparse
+import contextlib
+import csv
+import importlib.util
+import io
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from main import main
+from stats import LATENCY_PERCENTILES
+
+
+# The arguments of main.main with the same defaults as sim-blockchain.py
+DEFAULTS = {
+    "num_miners": 5,
+    "num_nodes": 2,
+    "num_neighbors": 1,
+    "hashrate": 10000,
+    "blocktime": 100,
+    "blocksize": 100,
+    "num_wallets": 10,
+    "num_transactions": 0,
+    "interval": 10,
+    "print_interval": 144,
+    "reward": 50,
+    "halving": 210000,
+    "years": 1,
+    "blocks": None,
+    "difficulty": None,
+    "latency": 0,
+    "bandwidth": float("inf"),
+    "fee": 0,
+    "fee_priority": False,
+    "fast_forward": False,
+    "precompute_delays": False,
+    "delay_bucket": 4096,
+    "arrivals": "fixed",
+    "topology": "random",
+    "link_latency": None,
+    "link_bandwidth": None,
+    "link_config": None,
+    "relay": "full",
+    "mempool_overlap": 0.99,
+    "forks": False,
+    "finality": 100,
+    "fee_rates": None,
+    "pool_bytes": None,
+    "tx_sizes": None,
+    "block_bytes": None,
+    "trace": None,
+    "trace_scale": 1.0,
+    "trace_chunk": 100000,
+}
+
+# Short names matching the sim-blockchain.py flags
+ALIASES = {
+    "miners": "num_miners",
+    "nodes": "num_nodes",
+    "neighbors": "num_neighbors",
+    "wallets": "num_wallets",
+    "transactions": "num_transactions",
+    "print": "print_interval",
+}
+
+# The keys of Stats.print_dict, in the order they are written
+STAT_COLUMNS = [
+    "block_num",
+    "block_percent",
+    "abt",
+    "tps",
+    "tx_num",
+    "difficulty",
+    "coins",
+    "inflation",
+    "eta",
+    "pool",
+    "io_requests",
+    "nmb",
+    "fees",
+    "network_time",
+    "stale_rate",
+    "reorgs",
+    "max_reorg_depth",
+    "latency_p50",
+    "latency_p90",
+    "latency_p99",
+    "latency_p999",
+]
+
+# Confirmation latency percentiles over the whole run, rather than its last print interval
+RUN_LATENCY_COLUMNS = [f"run_{key}" for key in LATENCY_PERCENTILES]
+
+COLUMNS = ["run_id", "seed"] + list(DEFAULTS) + STAT_COLUMNS + RUN_LATENCY_COLUMNS
+
+
+def parse_value(value):
+    """
+    Parses a value given on the command line into a bool, None, int, float or string.
+    """
+    lowered = value.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    if lowered == "none":
+        return None
+
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+
+    return value
+
+
+def parse_grid(items):
+    """
+    Parses grid items of the form PARAM=V1;V2 into the values to sweep for each parameter.
+
+    Values are separated by ";" rather than ",", which distribution specs such as lognormal:0.05,0.5 contain.
+
+    Args:
+        items (list): The grid items.
+
+    Returns:
+        dict: The values to sweep for each parameter.
+
+    Raises:
+        ValueError: If an item has no "=".
+    """
+    grid = {}
+    for item in items:
+        if "=" not in item:
+            raise ValueError(f"Grid items must be PARAM=V1;V2, got: {item}")
+        key, values = item.split("=", 1)
+        grid[key] = [parse_value(value) for value in values.split(";")]
+
+    return grid
+
+
+def normalize(config):
+    """
+    Returns the config with aliases resolved and every missing argument set to its default.
+
+    Raises:
+        ValueError: If the config has an argument main does not take.
+    """
+    full = dict(DEFAULTS)
+    for key, value in config.items():
+        key = ALIASES.get(key, key)
+        if key not in DEFAULTS:
+            raise ValueError(f"Unknown sweep parameter: {key}")
+        full[key] = value
+
+    return full
+
+
+def expand_grid(grid):
+    """
+    Returns every combination of the values in grid as a list of configs.
+
+    Args:
+        grid (dict): The values to sweep for each parameter.
+
+    Returns:
+        list: The configs, one per combination.
+    """
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*grid.values())]
+
+
+def get_run_id(config, seed):
+    """
+    Returns an id for a run that stays the same between sweeps, used to skip finished runs on resume.
+    """
+    params = "&".join(f"{key}={config[key]}" for key in DEFAULTS)
+    return f"{params}&seed={seed}"
+
+
+def run_config(config, seed):
+    """
+    Runs a single simulation with its own seed and returns its final stats as a row.
+
+    The per-block output of the run is discarded so workers do not interleave their prints.
+
+    Args:
+        config (dict): The arguments of main.main.
+        seed (int): The seed for the run.
+
+    Returns:
+        dict: The run id, seed, config and the final Stats.print_dict of the run.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = main(**config, seed=seed)
+
+    row = {"run_id": get_run_id(config, seed), "seed": seed}
+    row.update(config)
+    row.update({key: stats.print_dict[key] for key in STAT_COLUMNS})
+    row.update(
+        {
+            f"run_{key}": stats.latencies.get_percentile(percentile)
+            for key, percentile in LATENCY_PERCENTILES.items()
+        }
+    )
+
+    return row
+
+
+def read_results(output):
+    """
+    Returns the rows already written to output, or an empty list if it does not exist.
+    """
+    if not os.path.exists(output):
+        return []
+
+    if output.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return pq.read_table(output).to_pylist()
+
+    with open(output, newline="") as file:
+        return list(csv.DictReader(file))
+
+
+def write_result(output, rows, row):
+    """
+    Saves a finished run to output so an interrupted sweep keeps its results.
+
+    CSV rows are appended as they finish. Parquet has no append, so the file is rewritten with every row.
+    """
+    rows.append(row)
+
+    if output.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table(
+            {column: [row.get(column) for row in rows] for column in COLUMNS}
+        )
+        pq.write_table(table, output)
+        return
+
+    new_file = not os.path.exists(output) or os.path.getsize(output) == 0
+    with open(output, "a", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=COLUMNS)
+        if new_file:
+            writer.writeheader()
+        writer.writerow(row)
+
+
+def sweep(configs, output, workers=None, seeds=1, base_seed=0):
+    """
+    Runs every config across a process pool and collects the final stats of each run into one table.
+
+    Each config is run once per seed, with seeds base_seed .. base_seed + seeds - 1.
+    Runs whose id is already in output are skipped, so a sweep can be resumed by running it again.
+
+    Args:
+        configs (list): The configs to run. Missing arguments of main.main take the sim-blockchain.py defaults.
+        output (str): The results file. Written as Parquet if it ends with .parquet, otherwise as CSV.
+        workers (int, optional): The number of worker processes. Defaults to the number of CPUs.
+        seeds (int, optional): The number of seeds to run each config with. Defaults to 1.
+        base_seed (int, optional): The first seed. Defaults to 0.
+
+    Returns:
+        list: The rows of every finished run, including those from earlier sweeps.
+    """
+    if seeds < 1:
+        raise ValueError("Seeds must be at least 1")
+
+    # Checked before any run, rather than failing to save the first one
+    if output.endswith(".parquet") and importlib.util.find_spec("pyarrow") is None:
+        raise ImportError("Parquet sweep results need pyarrow - pip install pyarrow")
+
+    rows = read_results(output)
+    done = {row["run_id"] for row in rows}
+
+    runs = []
+    for config in configs:
+        config = normalize(config)
+        for seed in range(base_seed, base_seed + seeds):
+            if get_run_id(config, seed) not in done:
+                runs.append((config, seed))
+
+    total = len(runs)
+    if len(done) > 0:
+        print(f"Skipping {len(done)} finished runs in {output}")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(run_config, config, seed): (config, seed)
+            for config, seed in runs
+        }
+
+        for count, future in enumerate(as_completed(futures), start=1):
+            config, seed = futures[future]
+            try:
+                row = future.result()
+            except Exception as error:
+                print(f"[{count}/{total}] Failed {get_run_id(config, seed)}: {error}")
+                continue
+
+            write_result(output, rows, row)
+            print(
+                f"[{count}/{total}] {row['run_id']} ABT:{round(row['abt'], 2)}s TPS:{round(row['tps'], 2)}"
+            )
+
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run sim-blockchain.py over a grid or list of configurations."
+    )
+
+    parser.add_argument(
+        "--grid",
+        nargs="+",
+        default=[],
+        metavar="PARAM=V1;V2",
+        help="Values to sweep for a parameter, separated by semicolons so distribution specs keep their commas, e.g. 'blocktime=3.27;10' 'link_latency=lognormal:0.05,0.5;lognormal:0.1,0.5'. Quote each item in the shell. Every combination is run.",
+    )
+    parser.add_argument(
+        "--configs",
+        type=str,
+        default=None,
+        help="JSON file with a list of configs to run instead of a grid.",
+    )
+    parser.add_argument(
+        "--set",
+        nargs="+",
+        default=[],
+        metavar="PARAM=VALUE",
+        help="Fixed values applied to every run, e.g. years=10 fast_forward=true.",
+    )
+    parser.add_argument("--output", type=str, default="sweep.csv")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seeds", type=int, default=1)
+    parser.add_argument("--base-seed", type=int, default=0)
+
+    args = parser.parse_args()
+
+    fixed = {}
+    for item in args.set:
+        key, value = item.split("=", 1)
+        fixed[key] = parse_value(value)
+
+    if args.configs is not None:
+        with open(args.configs) as file:
+            configs = json.load(file)
+    else:
+        configs = expand_grid(parse_grid(args.grid))
+
+    configs = [{**fixed, **config} for config in configs]
+
+    sweep(
+        configs,
+        output=args.output,
+        workers=args.workers,
+        seeds=args.seeds,
+        base_seed=args.base_seed,
+    )
@@ -0,0 +1,37 @@
+from main import main
+
+
+def run(capsys, **options):
+    """
+    Runs a small unseeded network with per-link latencies and bandwidths, and returns what it printed.
+    """
+    main(
+        num_miners=5,
+        num_nodes=40,
+        num_neighbors=3,
+        hashrate=10000,
+        blocktime=100,
+        blocksize=100,
+        num_wallets=20,
+        num_transactions=5,
+        interval=10,
+        print_interval=100,
+        reward=50,
+        halving=210000,
+        years=1,
+        blocks=300,
+        link_latency="lognormal:0.05,0.5",
+        link_bandwidth="pareto:100000,1.5",
+        **options,
+    )
+    return capsys.readouterr().out.splitlines()
+
+
+def test_resume_without_seed_matches_uninterrupted_run(tmp_path, capsys):
+    # The last checkpoint is saved at block 200, so the resumed run prints the same end of run
+    path = str(tmp_path / "checkpoint.bin")
+    full = run(capsys, checkpoint=path, checkpoint_every=100)
+    resumed = run(capsys, resume=path)
+
+    assert resumed[0].startswith("End:")
+    assert resumed == full[-len(resumed) :]
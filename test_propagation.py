@@ -0,0 +1,96 @@
+import random
+
+import pytest
+import simpy
+
+from core import Block
+from init_objs import init_nodes
+from links import LinkModel
+
+
+def propagate(precompute_delays, bandwidth, size, origin, links=None):
+    """
+    Mines one block on origin in a seeded network, and returns the time it took to spread and every node's counters.
+
+    Precomputed paths are picked for the exact block size, so they match the gossip.
+    """
+    env = simpy.Environment()
+    nodes = init_nodes(
+        env,
+        50,
+        3,
+        latency=0.1,
+        bandwidth=bandwidth,
+        precompute_delays=precompute_delays,
+        rng=random.Random(4),
+        delay_bucket=1,
+        links=links,
+    )
+
+    block = Block(env, 1, blocksize=100)
+    block.size = size
+    env.run(env.process(nodes[origin].mine_block(block)))
+
+    counters = [
+        (
+            list(node.broadcast_times),
+            node.total_io_requests,
+            node.network_usage,
+            list(node.ledger),
+        )
+        for node in nodes
+    ]
+    return env.now, counters
+
+
+def check_against_gossip(bandwidth, links=None):
+    for origin, size in enumerate([1280, 5000, 33024]):
+        gossip_finish, gossip_counters = propagate(
+            False, bandwidth, size, origin * 7, links
+        )
+        finish, counters = propagate(True, bandwidth, size, origin * 7, links)
+
+        assert finish == pytest.approx(gossip_finish)
+        for (times, io, usage, ledger), expected in zip(counters, gossip_counters):
+            assert times == pytest.approx(expected[0])
+            assert (io, usage, ledger) == expected[1:]
+
+
+@pytest.mark.parametrize("bandwidth", [float("inf"), 100000])
+def test_precomputed_delays_match_gossip(bandwidth):
+    check_against_gossip(bandwidth)
+
+
+def test_precomputed_delays_match_gossip_on_heterogeneous_links():
+    links = LinkModel.from_config(
+        None,
+        latency=0.1,
+        bandwidth=100000,
+        link_latency="lognormal:0.1,0.5",
+        link_bandwidth="pareto:100000,1.5",
+    )
+    check_against_gossip(100000, links)
+
+
+def test_precomputed_transmit_time_uses_block_size():
+    # The bucket only picks the paths, so a block far smaller than it is still charged at its own size
+    env = simpy.Environment()
+    nodes = init_nodes(
+        env,
+        50,
+        3,
+        latency=0.1,
+        bandwidth=100000,
+        precompute_delays=True,
+        rng=random.Random(4),
+    )
+    assert nodes[0].delay_model.bucket == 4096
+
+    block = Block(env, 1, blocksize=100)
+    block.size = 1280
+    env.run(env.process(nodes[0].mine_block(block)))
+
+    _, gossip_counters = propagate(False, 100000, 1280, 0)
+    network_time = sum(node.broadcast_times[-1] for node in nodes)
+    expected = sum(counter[0][-1] for counter in gossip_counters)
+    assert network_time == pytest.approx(expected, rel=0.05)
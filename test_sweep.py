@@ -0,0 +1,31 @@
+from sweep import expand_grid, normalize, parse_grid, run_config
+
+
+def test_grid_keeps_distribution_commas():
+    grid = parse_grid(
+        ["link_latency=lognormal:0.05,0.5;lognormal:0.1,0.5", "blocktime=3.27;10"]
+    )
+    assert grid == {
+        "link_latency": ["lognormal:0.05,0.5", "lognormal:0.1,0.5"],
+        "blocktime": [3.27, 10],
+    }
+    assert len(expand_grid(grid)) == 4
+
+
+def test_sweep_runs_two_parameter_distribution():
+    configs = expand_grid(
+        parse_grid(["link_latency=lognormal:0.05,0.5;lognormal:0.1,0.5"])
+    )
+    rows = [
+        run_config(
+            normalize({**config, "num_nodes": 10, "num_neighbors": 3, "blocks": 20}),
+            seed=1,
+        )
+        for config in configs
+    ]
+
+    assert [row["link_latency"] for row in rows] == [
+        "lognormal:0.05,0.5",
+        "lognormal:0.1,0.5",
+    ]
+    assert rows[0]["run_id"] != rows[1]["run_id"]
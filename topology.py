@@ -0,0 +1,352 @@
+import random
+
+import numpy as np
+
+
+class Topology:
+    """
+    An undirected network stored as adjacency arrays (CSR).
+
+    The neighbors of node i are targets[offsets[i]:offsets[i + 1]], so the whole network takes two integer arrays
+    however many nodes it has. Every link is stored once in each direction.
+
+    Attributes:
+        num_nodes: The number of nodes.
+        offsets: The start of each node's neighbors in targets, plus the total number of entries at the end.
+        targets: The neighbors of every node, node by node.
+        latencies: The latency of each entry of targets, or None if every link uses its node's latency.
+        bandwidths: The bandwidth of each entry of targets, or None if every link uses its node's bandwidth.
+    """
+
+    def __init__(self, num_nodes, offsets, targets, latencies=None, bandwidths=None):
+        self.num_nodes = num_nodes
+        self.offsets = offsets
+        self.targets = targets
+        self.latencies = latencies
+        self.bandwidths = bandwidths
+
+    @classmethod
+    def from_edges(cls, num_nodes, sources, targets, latencies=None):
+        """
+        Builds a topology from a list of links.
+
+        Each link is added in both directions. Self loops and repeated links are dropped, keeping the first.
+        A node's neighbors are kept in the order its links first appear, links it chose before links to it.
+
+        Args:
+            num_nodes (int): The number of nodes.
+            sources (array): The first node of each link.
+            targets (array): The second node of each link.
+            latencies (array, optional): The latency of each link. Defaults to None.
+
+        Returns:
+            Topology: The topology.
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+
+        keep = sources != targets
+        sources, targets = sources[keep], targets[keep]
+
+        both_sources = np.concatenate([sources, targets])
+        both_targets = np.concatenate([targets, sources])
+
+        # np.unique returns the first index of each link, sorting them back restores the original order
+        _, first = np.unique(both_sources * num_nodes + both_targets, return_index=True)
+        first.sort()
+
+        order = first[np.argsort(both_sources[first], kind="stable")]
+
+        offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(both_sources[first], minlength=num_nodes), out=offsets[1:]
+        )
+
+        if latencies is not None:
+            latencies = np.asarray(latencies, dtype=float)[keep]
+            latencies = np.concatenate([latencies, latencies])[order]
+
+        return cls(num_nodes, offsets, both_targets[order], latencies)
+
+    @property
+    def num_links(self):
+        return len(self.targets) // 2
+
+    def get_degrees(self):
+        return np.diff(self.offsets)
+
+    def get_sources(self):
+        """
+        Returns the node each entry of targets belongs to.
+        """
+        return np.repeat(np.arange(self.num_nodes), self.get_degrees())
+
+    def get_components(self):
+        """
+        Labels the connected components with a breadth first search over whole frontiers at a time.
+
+        Returns:
+            tuple: The component of each node, numbered in order of their lowest node, and the number of components.
+        """
+        labels = np.full(self.num_nodes, -1, dtype=np.int64)
+        count = 0
+
+        for start in range(self.num_nodes):
+            if labels[start] >= 0:
+                continue
+
+            labels[start] = count
+            frontier = np.array([start])
+            while len(frontier):
+                starts = self.offsets[frontier]
+                lengths = self.offsets[frontier + 1] - starts
+
+                # The positions in targets of every neighbor of the frontier
+                positions = np.repeat(
+                    starts - np.cumsum(lengths) + lengths, lengths
+                ) + np.arange(lengths.sum())
+
+                reached = self.targets[positions]
+                frontier = np.unique(reached[labels[reached] < 0])
+                labels[frontier] = count
+
+            count += 1
+
+        return labels, count
+
+    def is_connected(self):
+        return self.get_components()[1] <= 1
+
+    def connect(self):
+        """
+        Returns the topology with one link added from every smaller component to the largest.
+
+        Each component's lowest node is linked to a node of the largest component, spread evenly over it.
+        The links get the average latency of the others.
+
+        Returns:
+            Topology: The connected topology, or itself if it is already connected.
+        """
+        labels, count = self.get_components()
+        if count <= 1:
+            return self
+
+        largest = np.argmax(np.bincount(labels))
+        largest_nodes = np.flatnonzero(labels == largest)
+
+        # Components are numbered in order of their lowest node, so this is the lowest node of each
+        _, lowest = np.unique(labels, return_index=True)
+        others = lowest[np.arange(count) != largest]
+
+        sources = np.concatenate([self.get_sources(), others])
+        targets = np.concatenate(
+            [self.targets, largest_nodes[np.arange(len(others)) % len(largest_nodes)]]
+        )
+
+        latencies = None
+        if self.latencies is not None:
+            average = self.latencies.mean() if len(self.latencies) else 0
+            latencies = np.concatenate(
+                [self.latencies, np.full(len(others), average)]
+            )
+
+        return Topology.from_edges(self.num_nodes, sources, targets, latencies)
+
+
+def random_topology(num_nodes, degree, rng=random):
+    """
+    Every node picks degree other nodes at random and the links are made both ways, the original model.
+
+    Draws the same neighbors from rng as sampling from a list of every other node,
+    without building that list for each node.
+    """
+    picks = min(degree, num_nodes - 1)
+
+    targets = []
+    for _ in range(num_nodes):
+        targets.extend(rng.sample(range(num_nodes - 1), picks))
+
+    sources = np.repeat(np.arange(num_nodes), picks)
+    targets = np.array(targets, dtype=np.int64)
+
+    # Skips the node itself, as if picking from the other nodes
+    targets += targets >= sources
+
+    return Topology.from_edges(num_nodes, sources, targets)
+
+
+def regular_topology(num_nodes, degree, generator):
+    """
+    A random degree-regular network from pairing shuffled link ends (the configuration model).
+
+    The rare self loops and repeated links are dropped, so a few nodes end with slightly fewer links.
+    """
+    ends = np.repeat(np.arange(num_nodes), degree)
+    generator.shuffle(ends)
+
+    # An odd number of ends leaves one unpaired
+    ends = ends[: len(ends) - len(ends) % 2]
+
+    return Topology.from_edges(num_nodes, ends[0::2], ends[1::2])
+
+
+def erdos_renyi_topology(num_nodes, degree, generator):
+    """
+    An Erdos-Renyi network where every pair is linked with probability degree / (num_nodes - 1).
+
+    The number of links is drawn first and then that many pairs, so it never looks at all num_nodes^2 pairs.
+    """
+    pairs = num_nodes * (num_nodes - 1) // 2
+    count = generator.binomial(pairs, min(degree / max(num_nodes - 1, 1), 1))
+
+    sources = generator.integers(0, num_nodes, count)
+    targets = generator.integers(0, num_nodes, count)
+
+    return Topology.from_edges(num_nodes, sources, targets)
+
+
+def scale_free_topology(num_nodes, degree, generator):
+    """
+    A Barabasi-Albert scale-free network, with an average degree of about degree.
+
+    Starts from a clique of degree / 2 + 1 nodes, and every node after links to degree / 2 nodes picked
+    in proportion to their degree.
+    """
+    links = max(1, min(degree // 2, num_nodes - 1))
+
+    sources = []
+    targets = []
+    for i in range(links + 1):
+        for j in range(i + 1, links + 1):
+            sources.append(i)
+            targets.append(j)
+
+    # Every link end, so a uniform pick from it is a pick in proportion to degree
+    ends = sources + targets
+    uniforms = generator.random((max(num_nodes - links - 1, 0), links)).tolist()
+
+    for node, row in zip(range(links + 1, num_nodes), uniforms):
+        picked = {ends[int(u * len(ends))] for u in row}
+        for target in picked:
+            sources.append(node)
+            targets.append(target)
+            ends.append(node)
+            ends.append(target)
+
+    return Topology.from_edges(num_nodes, sources, targets)
+
+
+def small_world_topology(num_nodes, degree, generator, rewire=0.1):
+    """
+    A Watts-Strogatz small-world network.
+
+    Every node links to its degree / 2 nearest nodes on each side of a ring, then each link is rewired
+    to a random node with probability rewire.
+    """
+    half = max(1, min(degree // 2, (num_nodes - 1) // 2))
+
+    sources = np.repeat(np.arange(num_nodes), half)
+    targets = (sources + np.tile(np.arange(1, half + 1), num_nodes)) % num_nodes
+
+    rewired = generator.random(len(targets)) < rewire
+    targets[rewired] = generator.integers(0, num_nodes, rewired.sum())
+
+    return Topology.from_edges(num_nodes, sources, targets)
+
+
+def geographic_topology(
+    num_nodes, degree, generator, latency=0, clusters=8, local=0.8, spread=0.05
+):
+    """
+    Nodes placed in geographic clusters, mostly linked within their cluster, with latencies from distance.
+
+    Cluster centers are spread over a unit square and nodes scattered around them. Each node picks degree / 2
+    neighbors, from its own cluster with probability local and from anywhere otherwise.
+    A link's latency grows with its length, scaled so the average latency is latency.
+
+    Args:
+        latency (float): The average link latency.
+        clusters (int): The number of clusters.
+        local (float): The probability a neighbor is picked from the node's own cluster.
+        spread (float): The standard deviation of the nodes around their cluster center.
+    """
+    clusters = max(1, min(clusters, num_nodes))
+    picks = max(1, degree // 2)
+
+    centers = generator.random((clusters, 2))
+    cluster = generator.integers(0, clusters, num_nodes)
+    positions = centers[cluster] + generator.normal(0, spread, (num_nodes, 2))
+
+    # Nodes sorted by cluster, so a cluster's nodes are one contiguous run
+    by_cluster = np.argsort(cluster, kind="stable")
+    sizes = np.bincount(cluster, minlength=clusters)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    sources = np.repeat(np.arange(num_nodes), picks)
+    uniforms = generator.random(len(sources))
+
+    local_targets = by_cluster[
+        starts[cluster[sources]]
+        + (uniforms * sizes[cluster[sources]]).astype(np.int64)
+    ]
+    anywhere = generator.integers(0, num_nodes, len(sources))
+    targets = np.where(
+        generator.random(len(sources)) < local, local_targets, anywhere
+    )
+
+    distances = np.linalg.norm(positions[sources] - positions[targets], axis=1)
+    mean = distances.mean() if len(distances) else 0
+    if mean > 0:
+        latencies = latency * (0.25 + 0.75 * distances / mean)
+    else:
+        latencies = np.full(len(distances), float(latency))
+
+    return Topology.from_edges(num_nodes, sources, targets, latencies)
+
+
+TOPOLOGIES = {
+    "random": random_topology,
+    "regular": regular_topology,
+    "erdos-renyi": erdos_renyi_topology,
+    "scale-free": scale_free_topology,
+    "small-world": small_world_topology,
+    "geographic": geographic_topology,
+}
+
+
+def get_topology(name, num_nodes, degree, rng=random, latency=0):
+    """
+    Builds a topology with the given generator.
+
+    Any components the newer generators leave apart are joined with Topology.connect. The original random
+    topology is returned as drawn, so seeded runs keep the same links, even if they leave nodes unreachable.
+
+    Args:
+        name (str): The generator. One of random, regular, erdos-renyi, scale-free, small-world or geographic.
+        num_nodes (int): The number of nodes.
+        degree (int): The neighbors each node picks for random, and the target average degree for the others.
+        rng (random.Random, optional): The random number stream. Defaults to the random module.
+        latency (float, optional): The average link latency of geographic topologies. Defaults to 0.
+
+    Raises:
+        ValueError: If the name is not a known generator.
+
+    Returns:
+        Topology: The topology.
+    """
+    if name not in TOPOLOGIES:
+        raise ValueError(
+            f"Unknown topology: {name}. Must be one of {', '.join(TOPOLOGIES)}"
+        )
+
+    if name == "random":
+        return random_topology(num_nodes, degree, rng=rng)
+
+    # The NumPy generators draw from a seed taken from rng, so the topology still follows --seed
+    generator = np.random.default_rng(rng.getrandbits(64))
+    if name == "geographic":
+        topology = geographic_topology(num_nodes, degree, generator, latency=latency)
+    else:
+        topology = TOPOLOGIES[name](num_nodes, degree, generator)
+
+    return topology.connect()
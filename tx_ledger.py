@@ -0,0 +1,133 @@
+from array import array
+
+import numpy as np
+
+
+class TransactionLedger:
+    """
+    A columnar store of the transactions added to blocks.
+
+    Each processed transaction is one row across typed arrays instead of a Transaction object kept alive
+    by its block, so a row takes 48 bytes. Blocks reference their transactions as a range of row numbers.
+    Rows are numbered from the start of the run. Rows older than the oldest retained block can be dropped with trim.
+
+    Attributes:
+        creation_times: The time each transaction was created.
+        process_times: The time each transaction was added to a block.
+        sender_ids: The id of each sender's wallet. -1 for reward transactions.
+        receiver_ids: The id of each receiver's wallet.
+        amounts: The amount each receiver got, after the fee.
+        fees: The fee paid on each transaction.
+        offset: The row number of the first stored row.
+    """
+
+    def __init__(self):
+        self.creation_times = array("d")
+        self.process_times = array("d")
+        self.sender_ids = array("q")
+        self.receiver_ids = array("q")
+        self.amounts = array("d")
+        self.fees = array("d")
+        self.offset = 0
+
+    def append(self, transaction, process_time, fee=0):
+        """
+        Adds a processed transaction.
+
+        Args:
+            transaction (Transaction): The transaction.
+            process_time (float): The time it was added to a block.
+            fee (float, optional): The fee paid on it. Defaults to 0.
+
+        Returns:
+            int: The row number of the transaction.
+        """
+        self.creation_times.append(transaction.creation_time)
+        self.process_times.append(process_time)
+        self.sender_ids.append(
+            -1 if transaction.sender is None else transaction.sender.id
+        )
+        self.receiver_ids.append(transaction.receiver.id)
+        self.amounts.append(transaction.amount)
+        self.fees.append(fee)
+
+        return len(self) - 1
+
+    def get_rows(self, start, count):
+        """
+        Returns the rows start .. start + count - 1 as (creation_time, process_time, sender_id, receiver_id, amount, fee) tuples.
+
+        Raises:
+            IndexError: If the rows have been trimmed or do not exist yet.
+        """
+        if start < self.offset or start + count > len(self):
+            raise IndexError("Transaction rows are not in the ledger")
+
+        begin = start - self.offset
+        end = begin + count
+        return list(
+            zip(
+                self.creation_times[begin:end],
+                self.process_times[begin:end],
+                self.sender_ids[begin:end],
+                self.receiver_ids[begin:end],
+                self.amounts[begin:end],
+                self.fees[begin:end],
+            )
+        )
+
+    def extend(
+        self, creation_times, process_time, sender_ids, receiver_ids, amounts, fees
+    ):
+        """
+        Adds a batch of processed transactions given as NumPy arrays, written to each column at once.
+
+        Args:
+            creation_times (numpy.ndarray): The time each transaction was created.
+            process_time (float): The time they were added to a block.
+            sender_ids (numpy.ndarray): The id of each sender's wallet. -1 for rewards.
+            receiver_ids (numpy.ndarray): The id of each receiver's wallet.
+            amounts (numpy.ndarray): The amount each receiver got, after the fee.
+            fees (numpy.ndarray): The fee paid on each transaction.
+
+        Returns:
+            int: The row number of the first transaction.
+        """
+        start = len(self)
+
+        self.creation_times.frombytes(np.asarray(creation_times, dtype=float).tobytes())
+        self.process_times.frombytes(
+            np.full(len(creation_times), process_time, dtype=float).tobytes()
+        )
+        self.sender_ids.frombytes(np.asarray(sender_ids, dtype=np.int64).tobytes())
+        self.receiver_ids.frombytes(np.asarray(receiver_ids, dtype=np.int64).tobytes())
+        self.amounts.frombytes(np.asarray(amounts, dtype=float).tobytes())
+        self.fees.frombytes(np.asarray(fees, dtype=float).tobytes())
+
+        return start
+
+    def trim(self, start):
+        """
+        Drops the rows before start.
+
+        The arrays are only shifted once at least half of them can be dropped, so trimming is amortized O(1) per row.
+        """
+        drop = start - self.offset
+        if drop <= 0 or drop * 2 < len(self.amounts):
+            return
+
+        for column in (
+            self.creation_times,
+            self.process_times,
+            self.sender_ids,
+            self.receiver_ids,
+            self.amounts,
+            self.fees,
+        ):
+            del column[:drop]
+
+        self.offset = start
+
+    def __len__(self):
+        # The row number one past the last row
+        return self.offset + len(self.amounts)
@@ -0,0 +1,110 @@
+import csv
+
+import numpy as np
+
+from links import parse_distribution, draw
+
+
+# Sizes in bytes of the parts of a legacy (P2PKH) transaction
+OVERHEAD_SIZE = 10
+INPUT_SIZE = 148
+OUTPUT_SIZE = 34
+
+
+class TransactionSizes:
+    """
+    The distribution of transaction sizes in bytes.
+
+    The spec is one of:
+        inputs-outputs:inputs,outputs - Each transaction has 1 + Poisson(inputs - 1) inputs and
+            1 + Poisson(outputs - 1) outputs, so inputs and outputs are the mean counts, and is sized as a legacy
+            P2PKH transaction: 10 bytes plus 148 per input and 34 per output.
+        histogram:path - An empirical histogram, a CSV of size,count rows (e.g. exported from a block explorer).
+            Sizes are drawn in proportion to their count.
+        Any distribution parse_distribution reads, e.g. lognormal:400,0.6 or a plain number.
+
+    Sizes are rounded to whole bytes and clipped to between minimum and maximum.
+
+    Attributes:
+        spec: The spec the sizes were read from.
+        minimum: The smallest size drawn.
+        maximum: The largest size drawn, or None for no limit.
+    """
+
+    def __init__(self, spec, minimum=60, maximum=None):
+        if maximum is not None and maximum < minimum:
+            raise ValueError(
+                f"Largest transaction size {maximum} is below the smallest {minimum}"
+            )
+
+        self.spec = spec
+        self.minimum = minimum
+        self.maximum = maximum
+        self.inputs_outputs = None
+        self.histogram = None
+        self.distribution = None
+
+        name, _, params = str(spec).partition(":")
+        name = name.strip().lower()
+
+        if name == "inputs-outputs":
+            counts = tuple(float(param) for param in params.split(",") if param)
+            if len(counts) != 2 or min(counts) < 1:
+                raise ValueError(
+                    "inputs-outputs takes the mean number of inputs and outputs, each at least 1"
+                )
+            self.inputs_outputs = counts
+        elif name == "histogram":
+            self.histogram = self.read_histogram(params)
+        else:
+            self.distribution = parse_distribution(spec)
+
+    @staticmethod
+    def read_histogram(path):
+        """
+        Reads a CSV of size,count rows. Rows that are not two numbers, e.g. a header, are skipped.
+
+        Returns:
+            tuple: The sizes and the probability of each.
+        """
+        sizes = []
+        counts = []
+        with open(path, newline="") as file:
+            for row in csv.reader(file):
+                try:
+                    size, count = float(row[0]), float(row[1])
+                except (ValueError, IndexError):
+                    continue
+                sizes.append(size)
+                counts.append(count)
+
+        counts = np.array(counts)
+        if len(sizes) == 0 or np.any(counts < 0) or counts.sum() <= 0:
+            raise ValueError(f"Transaction size histogram {path} has no sizes to draw")
+
+        return np.array(sizes), counts / counts.sum()
+
+    def draw(self, generator, size):
+        """
+        Draws size transaction sizes.
+
+        Returns:
+            numpy.ndarray: The sizes in bytes.
+        """
+        if self.inputs_outputs is not None:
+            inputs, outputs = self.inputs_outputs
+            sizes = (
+                OVERHEAD_SIZE
+                + INPUT_SIZE * (1 + generator.poisson(inputs - 1, size))
+                + OUTPUT_SIZE * (1 + generator.poisson(outputs - 1, size))
+            )
+        elif self.histogram is not None:
+            sizes = generator.choice(self.histogram[0], size, p=self.histogram[1])
+        else:
+            sizes = draw(self.distribution, generator, size)
+
+        sizes = np.maximum(np.rint(sizes), self.minimum)
+        if self.maximum is not None:
+            sizes = np.minimum(sizes, self.maximum)
+
+        return sizes.astype(np.int64)
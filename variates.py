@@ -0,0 +1,70 @@
+class BufferedVariates:
+    """
+    A random number stream that pre-generates its draws in blocks with NumPy.
+
+    Uniform and standard exponential draws are generated size at a time and handed out one by one,
+    refilling a buffer only once it runs out, so each draw is a list lookup instead of a Python-level RNG call.
+    It has the same methods as random.Random that the mining and transaction code uses, with the same
+    distributions, so it can be passed anywhere a random stream is taken.
+
+    Attributes:
+        generator: The NumPy Generator the draws come from.
+        size: The number of draws generated per refill.
+        uniforms: The buffered uniform draws on [0, 1).
+        exponentials: The buffered exponential draws with rate 1.
+        uniform_state: The generator state the uniform buffer was drawn from, so it can be drawn again.
+        exponential_state: The generator state the exponential buffer was drawn from.
+    """
+
+    def __init__(self, generator, size=65536):
+        if size <= 0:
+            raise ValueError("Size must be greater than 0")
+
+        self.generator = generator
+        self.size = size
+        self.uniforms = []
+        self.uniform_index = 0
+        self.uniform_state = None
+        self.exponentials = []
+        self.exponential_index = 0
+        self.exponential_state = None
+
+    def random(self):
+        """
+        Returns a uniform draw on [0, 1).
+        """
+        if self.uniform_index == len(self.uniforms):
+            self.uniform_state = self.generator.bit_generator.state
+            self.uniforms = self.generator.random(self.size).tolist()
+            self.uniform_index = 0
+
+        value = self.uniforms[self.uniform_index]
+        self.uniform_index += 1
+        return value
+
+    def expovariate(self, lambd):
+        """
+        Returns an exponential draw with rate lambd, the same as random.expovariate.
+        """
+        if self.exponential_index == len(self.exponentials):
+            self.exponential_state = self.generator.bit_generator.state
+            self.exponentials = self.generator.standard_exponential(self.size).tolist()
+            self.exponential_index = 0
+
+        value = self.exponentials[self.exponential_index]
+        self.exponential_index += 1
+        return value / lambd
+
+    def uniform(self, a, b):
+        """
+        Returns a uniform draw between a and b, the same as random.uniform.
+        """
+        return a + (b - a) * self.random()
+
+    def choice(self, seq):
+        """
+        Returns a uniformly chosen element of a non-empty sequence, the same as random.choice.
+        """
+        if len(seq) == 0:
+            raise IndexError("Cannot choose from an empty sequence")
+        return seq[min(int(self.random() * len(seq)), len(seq) - 1)]
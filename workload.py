@@ -0,0 +1,291 @@
+import math
+
+import numpy as np
+
+from core import Transaction
+from links import draw
+
+
+class FixedArrivals:
+    """
+    Ticks every interval seconds, in lockstep.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+
+    def next_gap(self, generator, now):
+        return self.interval
+
+
+class PoissonArrivals:
+    """
+    Ticks as a Poisson process with a mean gap of interval seconds.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+
+    def next_gap(self, generator, now):
+        return generator.exponential(self.interval)
+
+
+class BurstyArrivals:
+    """
+    Ticks in bursts of burst_size, spread * interval seconds apart, with Poisson gaps between bursts.
+
+    The gaps between bursts make up the time the burst skipped, so the long run rate is one tick per interval.
+    """
+
+    def __init__(self, interval, burst_size=10, spread=0.01):
+        if burst_size < 1:
+            raise ValueError("Burst size must be at least 1")
+
+        if not 0 <= spread <= 1:
+            raise ValueError("Spread must be between 0 and 1")
+
+        self.interval = interval
+        self.burst_size = burst_size
+        self.spread = spread
+        self.position = 0
+
+    def next_gap(self, generator, now):
+        self.position += 1
+        if self.position < self.burst_size:
+            return self.spread * self.interval
+
+        self.position = 0
+        quiet = self.burst_size * self.interval - (self.burst_size - 1) * (
+            self.spread * self.interval
+        )
+        return generator.exponential(quiet)
+
+
+class DiurnalArrivals:
+    """
+    Ticks as a Poisson process whose rate follows a daily cycle.
+
+    The rate at time t is (1 + amplitude * sin(2 pi t / period)) / interval, drawn by thinning
+    a Poisson process at the peak rate.
+    """
+
+    def __init__(self, interval, amplitude=0.5, period=24 * 60 * 60):
+        if not 0 <= amplitude <= 1:
+            raise ValueError("Amplitude must be between 0 and 1")
+
+        self.interval = interval
+        self.amplitude = amplitude
+        self.period = period
+
+    def next_gap(self, generator, now):
+        peak = (1 + self.amplitude) / self.interval
+        time = now
+
+        while True:
+            time += generator.exponential(1 / peak)
+            rate = (
+                1 + self.amplitude * math.sin(2 * math.pi * time / self.period)
+            ) / self.interval
+            if generator.random() * peak <= rate:
+                return time - now
+
+
+ARRIVALS = {
+    "fixed": FixedArrivals,
+    "poisson": PoissonArrivals,
+    "bursty": BurstyArrivals,
+    "diurnal": DiurnalArrivals,
+}
+
+
+def get_arrivals(name, interval):
+    """
+    Returns the arrival model with the given name.
+
+    Args:
+        name (str): The name of the model. One of fixed, poisson, bursty or diurnal.
+        interval (float): The mean time between ticks.
+
+    Raises:
+        ValueError: If the name is not a known model or the interval is not positive.
+    """
+    if name not in ARRIVALS:
+        raise ValueError(
+            f"Unknown arrival model: {name}. Must be one of {', '.join(ARRIVALS)}"
+        )
+
+    if interval <= 0:
+        raise ValueError("Interval must be greater than 0")
+
+    return ARRIVALS[name](interval)
+
+
+class Workload:
+    """
+    Generates the wallets' transactions in one batch per tick.
+
+    On each tick every wallet with a balance that has made fewer than num_transactions transactions sends one.
+    The eligible senders are found with a NumPy mask over the balances and tx_out counts, their amounts are drawn
+    in one call, and the whole batch is added to the pool at once.
+    The ticks come from an arrival model instead of always being interval seconds apart.
+
+    Each sender pays the wallet with the lowest balance after the tick's withdrawals (the second lowest if it is
+    the sender itself), ties going to the first wallet.
+
+    Attributes:
+        env: The environment.
+        wallets: The wallets.
+        blockchain: The blockchain.
+        num_transactions: The number of transactions each wallet makes.
+        arrivals: The arrival model giving the time between ticks.
+        generator: The NumPy Generator amounts and arrivals are drawn from.
+        end: Whether to stop the blockchain once every transaction has been made.
+        fee_rates: The parsed distribution of the fee rates wallets bid, or None outside fee market mode.
+        fee_generator: The NumPy Generator fee rates are drawn from, so bidding does not change the amounts.
+        sizes: The TransactionSizes transaction sizes are drawn from, or None to keep the fixed size.
+        size_generator: The NumPy Generator sizes are drawn from.
+        is_miner: Whether each wallet sends its whole balance, as miners' wallets do.
+        tx_count: The number of transactions made so far.
+        next_tick: The time of the next tick.
+    """
+
+    def __init__(
+        self,
+        env,
+        wallets,
+        miners,
+        blockchain,
+        num_transactions,
+        arrivals,
+        generator,
+        end=False,
+        fee_rates=None,
+        fee_generator=None,
+        sizes=None,
+        size_generator=None,
+    ):
+        if num_transactions > 0 and len(wallets) < 2:
+            raise ValueError("At least 2 wallets are needed to make transactions")
+
+        self.env = env
+        self.wallets = wallets
+        self.blockchain = blockchain
+        self.num_transactions = num_transactions
+        self.arrivals = arrivals
+        self.generator = generator
+        self.end = end
+        self.fee_rates = fee_rates
+        self.fee_generator = fee_generator
+        self.sizes = sizes
+        self.size_generator = size_generator
+        self.is_miner = np.array([wallet in miners for wallet in wallets], dtype=bool)
+        self.tx_count = 0
+        self.next_tick = env.now
+
+    def run(self, delay=0):
+        """
+        The workload process. Adds a batch of transactions every tick until every wallet is done.
+
+        Args:
+            delay (float, optional): The time until the first tick, used when resuming. Defaults to 0.
+        """
+
+        if delay > 0:
+            yield self.env.timeout(delay)
+
+        while (
+            self.tx_count < (self.num_transactions * len(self.wallets))
+            and not self.blockchain.stop_process
+        ):
+            self.add_batch()
+
+            gap = self.arrivals.next_gap(self.generator, self.env.now)
+            self.next_tick = self.env.now + gap
+            yield self.env.timeout(gap)
+
+        if self.end:
+            self.blockchain.stop_process = True
+
+    def add_batch(self):
+        """
+        Makes one transaction from every eligible wallet and adds them to the pool.
+
+        Returns:
+            int: The number of transactions made.
+        """
+        count = len(self.wallets)
+        balances = np.fromiter(
+            (wallet.balance for wallet in self.wallets), dtype=float, count=count
+        )
+        tx_out = np.fromiter(
+            (wallet.tx_out for wallet in self.wallets), dtype=np.int64, count=count
+        )
+
+        # Rounds the balance to 15 decimal places to avoid floating point errors
+        senders = np.flatnonzero(
+            (np.round(balances, 15) > 0) & (tx_out < self.num_transactions)
+        )
+        if len(senders) == 0:
+            return 0
+
+        # Miners send their whole balance, everyone else 5-10% of theirs
+        amounts = np.where(
+            self.is_miner[senders],
+            balances[senders],
+            balances[senders] * self.generator.uniform(0.05, 0.1, len(senders)),
+        )
+
+        if np.any(amounts <= 0):
+            raise ValueError("Amount is less than 0. This should not happen.")
+
+        after = balances.copy()
+        after[senders] -= amounts
+
+        if np.any(after < 0):
+            raise ValueError("Wallet has negative balance")
+
+        lowest = int(np.argmin(after))
+        others = after.copy()
+        others[lowest] = np.inf
+        second = int(np.argmin(others))
+        receivers = np.where(senders == lowest, second, lowest)
+
+        if self.fee_rates is not None:
+            fee_rates = draw(self.fee_rates, self.fee_generator, len(senders)).tolist()
+        else:
+            fee_rates = [0] * len(senders)
+
+        if self.sizes is not None:
+            sizes = self.sizes.draw(self.size_generator, len(senders)).tolist()
+        else:
+            sizes = [None] * len(senders)
+
+        transactions = []
+        for sender, receiver, amount, balance, fee_rate, size in zip(
+            senders.tolist(),
+            receivers.tolist(),
+            amounts.tolist(),
+            after[senders].tolist(),
+            fee_rates,
+            sizes,
+        ):
+            wallet = self.wallets[sender]
+            transaction = Transaction(
+                self.env,
+                amount=amount,
+                receiver=self.wallets[receiver],
+                sender=wallet,
+                subtract=False,
+            )
+            transaction.fee_rate = fee_rate
+            if size is not None:
+                transaction.size = size
+            transactions.append(transaction)
+
+            wallet.balance = balance
+            wallet.tx_out += 1
+
+        self.blockchain.add_transactions(transactions)
+        self.tx_count += len(transactions)
+
+        return len(transactions)